@@ -16,6 +16,7 @@ for i in range(0, 10000):
 insert_time_1 = process_time()
 
 print("Inserting 10k records took:  \t\t\t", insert_time_1 - insert_time_0)
+print("Record storage after insert (bytes/record):\t", grades_table.memory_usage() / len(keys))
 
 # Measuring update Performance
 update_cols = [
@@ -31,6 +32,7 @@ for i in range(0, 10000):
     query.update(choice(keys), *(choice(update_cols)))
 update_time_1 = process_time()
 print("Updating 10k records took:  \t\t\t", update_time_1 - update_time_0)
+print("Record storage after update (bytes/record):\t", grades_table.memory_usage() / len(keys))
 
 # Measuring Select Performance
 select_time_0 = process_time()
@@ -0,0 +1,119 @@
+"""
+Maintained aggregates. A SumIndex keeps the running sum of one column in primary
+key order so a range sum is two prefix lookups instead of a scan over records.
+The table keeps one SumIndex per column it was asked to track and feeds it on
+every insert, update and delete.
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+class SumIndex:
+    """
+    Fenwick (binary indexed) tree over one column, ordered by primary key.
+
+    - keys[i] is the i-th smallest primary key ever added, values[i] its current value.
+    - Deleted keys stay in place with value 0 so positions never shift on delete.
+    - Keys arriving in ascending order (the common case) are appended in O(log n).
+      A key that lands in the middle marks the tree stale; it is rebuilt in O(n)
+      on the next query instead of on every insert.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.values = []
+        self._tree = [0]    # 1-based, _tree[0] unused
+        self._stale = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def build(self, pairs):
+        """
+        Bulk load from (key, value) pairs in any order. O(n log n) for the sort, O(n) for the tree.
+        """
+        pairs = sorted(pairs)
+        self.keys = [k for k, _ in pairs]
+        self.values = [v for _, v in pairs]
+        self._rebuild()
+
+    def add(self, key, value):
+        """Track a new key (or revive a deleted one) with its value."""
+        n = len(self.keys)
+        if n == 0 or key > self.keys[-1]:
+            self.keys.append(key)
+            self.values.append(value)
+            if not self._stale:
+                self._append_node(value)
+            return
+        pos = bisect_left(self.keys, key)
+        if pos < n and self.keys[pos] == key:
+            self._set_at(pos, value)
+            return
+        self.keys.insert(pos, key)
+        self.values.insert(pos, value)
+        self._stale = True
+
+    def set(self, key, value):
+        """Change the value tracked for an existing key."""
+        pos = bisect_left(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            self._set_at(pos, value)
+
+    def remove(self, key):
+        """Stop counting a key (its slot stays with value 0)."""
+        self.set(key, 0)
+
+    def discard(self, key):
+        """Forget a key entirely (its record was reclaimed). The tree is rebuilt lazily."""
+        pos = bisect_left(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            del self.keys[pos]
+            del self.values[pos]
+            self._stale = True
+
+    def range_sum(self, start_key, end_key):
+        """Sum of values for keys in [start_key, end_key]."""
+        if self._stale:
+            self._rebuild()
+        lo = bisect_left(self.keys, start_key)
+        hi = bisect_right(self.keys, end_key)
+        if hi <= lo:
+            return 0
+        return self._prefix(hi) - self._prefix(lo)
+
+    # internal helpers
+    def _rebuild(self):
+        n = len(self.values)
+        tree = [0] + self.values
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+        self._stale = False
+
+    def _append_node(self, value):
+        # new node i covers (i - lowbit(i), i]: its own value plus the range below it
+        i = len(self._tree)
+        self._tree.append(value + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+
+    def _set_at(self, pos, value):
+        delta = value - self.values[pos]
+        self.values[pos] = value
+        if delta == 0 or self._stale:
+            return
+        i = pos + 1
+        n = len(self._tree) - 1
+        while i <= n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i):
+        # sum of the first i values
+        total = 0
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
@@ -0,0 +1,96 @@
+"""
+Bloom filter over primary keys. A key lookup first asks the filter: "absent"
+is certain and skips the primary key lookup altogether, "maybe" falls through
+to it. Meant for tables whose key lookups are expensive and mostly miss
+(existence checks, inserts of new keys).
+"""
+
+from math import ceil, log
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, bulk loads fall back to plain Python
+    np = None
+
+_MASK = (1 << 64) - 1
+
+
+class BloomFilter:
+    """
+    Bit array of `size` bits with `hashes` probe positions per key, sized for
+    `capacity` keys at `error_rate` false positives. A key's probe positions
+    are h1 + i * h2 (double hashing) from the two halves of its 64-bit hash.
+
+    - Bits cannot be cleared, so remove() only counts the key as stale. The
+      filter stays correct (no false negatives) but gets less selective.
+    - needs_rebuild() says when the owner should build a fresh filter: more keys
+      were added than it was sized for, or half of what it holds is stale.
+    """
+
+    def __init__(self, capacity: int = 1024, error_rate: float = 0.01):
+        if not 0 < error_rate < 1:
+            raise ValueError("Bloom filter error rate must be between 0 and 1")
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(64, ceil(-self.capacity * log(error_rate) / log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0      # keys added
+        self.stale = 0      # keys removed since (their bits are still set)
+
+    @staticmethod
+    def _hash(key):
+        # splitmix64 finalizer over hash(key), so any key that compares equal to a
+        # stored one (3.0 and 3) probes the same bits: neighbouring keys get
+        # unrelated 64-bit hashes
+        z = (hash(key) + 0x9E3779B97F4A7C15) & _MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+        return z ^ (z >> 31)
+
+    def add(self, key):
+        z = self._hash(key)
+        bits, size = self.bits, self.size
+        p, step = (z & 0xFFFFFFFF) % size, (z >> 32) | 1
+        for _ in range(self.hashes):
+            bits[p >> 3] |= 1 << (p & 7)
+            p = (p + step) % size
+        self.count += 1
+
+    def update(self, keys):
+        """Add many keys at once (vectorized with numpy)."""
+        if np is None:
+            for key in keys:
+                self.add(key)
+            return
+        z = np.fromiter(map(hash, keys), dtype=np.int64).view(np.uint64)
+        z = z + np.uint64(0x9E3779B97F4A7C15)   # uint64 arithmetic wraps like & _MASK
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+        size = np.uint64(self.size)
+        p, step = (z & np.uint64(0xFFFFFFFF)) % size, (z >> np.uint64(32)) | np.uint64(1)
+        bits = np.frombuffer(self.bits, dtype=np.uint8).copy()
+        for _ in range(self.hashes):
+            np.bitwise_or.at(bits, p >> np.uint64(3), np.left_shift(1, p & np.uint64(7)).astype(np.uint8))
+            p = (p + step) % size
+        self.bits = bytearray(bits.tobytes())
+        self.count += len(z)
+
+    def remove(self, key):
+        """Note that key left the set (its bits stay set)."""
+        self.stale += 1
+
+    def __contains__(self, key):
+        """False if key was never added, True if it probably was."""
+        z = self._hash(key)
+        bits, size = self.bits, self.size
+        p, step = (z & 0xFFFFFFFF) % size, (z >> 32) | 1
+        for _ in range(self.hashes):
+            if not bits[p >> 3] >> (p & 7) & 1:
+                return False   # stops at the first clear bit, so misses are cheap
+            p = (p + step) % size
+        return True
+
+    def needs_rebuild(self) -> bool:
+        return self.count > self.capacity or self.stale * 2 > self.count
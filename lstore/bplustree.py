@@ -0,0 +1,204 @@
+"""
+B+ tree used by Index for ordered column indexes. Inner nodes hold up to `order`
+separator keys, so a lookup is a handful of bisects over short lists no matter
+how many records the table has. All values live in the leaves, which are linked
+left to right, so a range lookup finds its first leaf once and then walks the
+chain. Each distinct value maps to the list of base rids that hold it.
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+class _Leaf:
+    __slots__ = ("keys", "values", "next")
+
+    def __init__(self, keys=None, values=None):
+        self.keys = keys if keys is not None else []
+        self.values = values if values is not None else []   # values[i]: rids with keys[i]
+        self.next = None
+
+
+class _Inner:
+    __slots__ = ("keys", "children")
+
+    def __init__(self, keys, children):
+        # children[i] holds keys < keys[i] <= keys in children[i + 1]
+        self.keys = keys
+        self.children = children
+
+
+class BPlusTree:
+    """
+    - insert / delete / get are O(log n); range walks the leaf chain.
+    - A leaf that overflows at the right edge of the tree (keys arriving in
+      ascending order, the common case) splits off only its last key, so
+      sequential loads leave full leaves instead of half empty ones.
+    - Deletes do not merge underfull leaves; empty leaves stay linked and are
+      skipped. Separators stay valid, so lookups are unaffected.
+    """
+
+    kind = "ordered"    # as reported by Index.kind
+    include = ()        # a plain index, see index.CoveringIndex
+
+    def __init__(self, order: int = 64):
+        if order < 3:
+            raise ValueError("B+ tree order must be at least 3")
+        self.order = order
+        self.root = _Leaf()
+        self._first = self.root
+        self._size = 0
+
+    def __len__(self):
+        """Number of (value, rid) entries."""
+        return self._size
+
+    def build(self, pairs):
+        """
+        Replace the contents with (key, rid) pairs sorted by key, built bottom-up:
+        leaves are packed full left to right, then each inner level is made from
+        the one below. O(n) instead of n inserts.
+        """
+        leaves = []
+        keys, values = [], []
+        size = 0
+        for key, rid in pairs:
+            size += 1
+            if keys and keys[-1] == key:
+                values[-1].append(rid)
+                continue
+            if len(keys) == self.order:
+                leaves.append(_Leaf(keys, values))
+                keys, values = [], []
+            keys.append(key)
+            values.append([rid])
+        leaves.append(_Leaf(keys, values))
+        for left, right in zip(leaves, leaves[1:]):
+            left.next = right
+
+        # lows[i] is the smallest key under level[i]
+        level, lows = leaves, [leaf.keys[0] if leaf.keys else None for leaf in leaves]
+        while len(level) > 1:
+            # spread children evenly so no inner node ends up with a single child
+            groups = -(-len(level) // (self.order + 1))
+            per, extra = divmod(len(level), groups)
+            parents, parent_lows = [], []
+            i = 0
+            for g in range(groups):
+                j = i + per + (1 if g < extra else 0)
+                parents.append(_Inner(lows[i + 1:j], level[i:j]))
+                parent_lows.append(lows[i])
+                i = j
+            level, lows = parents, parent_lows
+        self.root = level[0]
+        self._first = leaves[0]
+        self._size = size
+
+    def insert(self, key, rid):
+        """Add rid under key (a key may hold any number of rids)."""
+        path = []
+        node = self.root
+        while type(node) is _Inner:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        i = bisect_left(node.keys, key)
+        self._size += 1
+        if i < len(node.keys) and node.keys[i] == key:
+            node.values[i].append(rid)
+            return
+        node.keys.insert(i, key)
+        node.values.insert(i, [rid])
+        if len(node.keys) > self.order:
+            self._split_leaf(node, path, i)
+
+    def delete(self, key, rid):
+        """Remove rid from key. Raises KeyError if key is absent, ValueError if rid is."""
+        leaf = self._find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        if i == len(leaf.keys) or leaf.keys[i] != key:
+            raise KeyError(key)
+        leaf.values[i].remove(rid)
+        self._size -= 1
+        if not leaf.values[i]:
+            del leaf.keys[i]
+            del leaf.values[i]
+
+    def get(self, key):
+        """The rids stored under key ([] if none)."""
+        leaf = self._find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return list(leaf.values[i])
+        return []
+
+    def range(self, low=None, high=None):
+        """Yield (key, rids) for low <= key <= high in key order (None = unbounded)."""
+        if low is None:
+            leaf, i = self._first, 0
+        else:
+            leaf = self._find_leaf(low)
+            i = bisect_left(leaf.keys, low)
+        while leaf is not None:
+            keys = leaf.keys
+            while i < len(keys):
+                if high is not None and keys[i] > high:
+                    return
+                yield keys[i], leaf.values[i]
+                i += 1
+            leaf, i = leaf.next, 0
+
+    def items(self):
+        """Yield (key, rids) for every key in order."""
+        return self.range()
+
+    def min(self):
+        """Smallest key, None if the tree is empty."""
+        for key, _ in self.range():
+            return key
+        return None
+
+    def max(self):
+        """Largest key, None if the tree is empty."""
+        node = self.root
+        while type(node) is _Inner:
+            node = node.children[-1]
+        if node.keys:
+            return node.keys[-1]
+        # the rightmost leaf was emptied by deletes: fall back to a walk
+        last = None
+        for key, _ in self.range():
+            last = key
+        return last
+
+    # internal helpers
+    def _find_leaf(self, key):
+        node = self.root
+        while type(node) is _Inner:
+            node = node.children[bisect_right(node.keys, key)]
+        return node
+
+    def _split_leaf(self, leaf, path, inserted_at):
+        n = len(leaf.keys)
+        # appending at the right edge: keep this leaf full, start a new one
+        mid = n - 1 if leaf.next is None and inserted_at == n - 1 else n // 2
+        right = _Leaf(leaf.keys[mid:], leaf.values[mid:])
+        del leaf.keys[mid:]
+        del leaf.values[mid:]
+        right.next = leaf.next
+        leaf.next = right
+        self._insert_parent(path, right.keys[0], right)
+
+    def _insert_parent(self, path, sep, right):
+        while path:
+            parent, i = path.pop()
+            parent.keys.insert(i, sep)
+            parent.children.insert(i + 1, right)
+            if len(parent.keys) <= self.order:
+                return
+            mid = len(parent.keys) // 2
+            sep = parent.keys[mid]
+            right = _Inner(parent.keys[mid + 1:], parent.children[mid + 1:])
+            del parent.keys[mid:]
+            del parent.children[mid + 1:]
+        # the root split: grow the tree by one level
+        self.root = _Inner([sep], [self.root, right])
@@ -0,0 +1,38 @@
+"""
+Record timestamps. Every version a table writes is stamped from one shared
+hybrid logical clock: microseconds of wall time, bumped by one whenever the
+wall clock has not moved past the last timestamp handed out (same microsecond,
+or the system clock stepped back). Timestamps are therefore strictly increasing
+across all tables in the process, which is what time-travel reads rely on.
+"""
+
+from time import time_ns
+import threading
+
+
+class HybridClock:
+
+    def __init__(self):
+        self._last = 0
+        self._mu = threading.Lock()
+
+    def now(self) -> int:
+        """A timestamp larger than every one returned or observed before."""
+        wall = time_ns() // 1000
+        with self._mu:
+            self._last = wall if wall > self._last else self._last + 1
+            return self._last
+
+    def observe(self, ts: int):
+        """Move the clock past ts (e.g. the newest timestamp loaded from disk)."""
+        with self._mu:
+            if ts > self._last:
+                self._last = ts
+
+
+CLOCK = HybridClock()
+
+
+def now() -> int:
+    """Current timestamp of the shared clock, usable as an as_of argument."""
+    return CLOCK.now()
@@ -1,9 +1,24 @@
-from lstore.table import Table
+from lstore.table import Table, TAIL_RID_START, TIMESTAMP_COLUMN
+from lstore.storage import is_tail_rid
+from lstore.clock import CLOCK
 from lstore.bufferpool import BufferPool
 from lstore.lock_manager import LockManager
 import os
 import json
 
+# table files written before structured rids numbered tail records from here
+LEGACY_TAIL_START = 1_000_000_000
+RID_FORMAT = 2
+# record timestamps are microseconds from lstore.clock (older files used whole seconds)
+TS_UNIT = "us"
+
+
+def _upgrade_rid(rid):
+    """Map a legacy rid onto the structured rid space (base rids are unchanged)."""
+    if rid >= LEGACY_TAIL_START and not is_tail_rid(rid):
+        return TAIL_RID_START + (rid - LEGACY_TAIL_START)
+    return rid
+
 """
 The Database class is a general interface to the database and handles high-level operations such as
 starting and shutting down the database instance and loading the database from stored disk files.
@@ -71,18 +86,32 @@ class Database():
                 table = Table(data["name"], int(data["num_columns"]), int(data["key"]), self.bufferpool, self.lock_manager)
 
                 # restore counters
+                legacy = data.get("rid_format", 1) < RID_FORMAT
                 table._next_base_rid = int(data.get("next_base_rid", 1))
-                table._next_tail_rid = int(data.get("next_tail_rid", 1000000000))
+                table._next_tail_rid = int(data.get("next_tail_rid", TAIL_RID_START))
+                if legacy:
+                    table._next_tail_rid = _upgrade_rid(table._next_tail_rid)
 
                 # Table Rows -> (list of [rid, row])
                 rows_list = data.get("rows", [])
+                if legacy:
+                    for _, row in rows_list:
+                        row[0] = _upgrade_rid(int(row[0]))
+                        row[1] = _upgrade_rid(int(row[1]))
+                    rows_list = [[_upgrade_rid(int(rid)), row] for rid, row in rows_list]
+                if data.get("ts_unit") != TS_UNIT:
+                    for _, row in rows_list:
+                        row[TIMESTAMP_COLUMN] = int(row[TIMESTAMP_COLUMN]) * 1_000_000
                 for rid, row in rows_list:
-                    table._rows[int(rid)] = list(row)
+                    table._restore_row(int(rid), row)
+                # new versions must be stamped after everything already stored
+                CLOCK.observe(max((int(row[TIMESTAMP_COLUMN]) for _, row in rows_list), default=0))
 
-                # rebuild head pointers 
-                for rid, row in table._rows.items():
-                    if rid < 1_000_000_000:  
-                        table._head[rid] = row[0]  
+                # versions kept by merge and the horizon they were kept under
+                for br, hrows in data.get("history", []):
+                    table._restore_history(int(br), hrows)
+                retention = data.get("retention", {})
+                table.set_retention(retention.get("versions"), retention.get("seconds"))
 
                 # restore pk mapping if present; 
                 # or remake
@@ -91,22 +120,43 @@ class Database():
                     for k, br in pk_list:
                         table._pk[int(k)] = int(br)
                 else:
-                    for rid, row in table._rows.items():
-                        if rid < 1000000000:
+                    for rid, row in rows_list:
+                        if not is_tail_rid(int(rid)):
                             key_val = row[4 + table.key]
-                            table._pk[int(key_val)] = rid
+                            table._pk[int(key_val)] = int(rid)
 
                 # restore deleted flags
                 del_list = data.get("deleted", [])
                 for br, flag in del_list:
                     table._deleted[int(br)] = bool(flag)
 
-                # rebuild primary key index structure if present
-                try:
-                    for k, br in table._pk.items():
-                        table._index_add_pk(k, br)
-                except Exception:
-                    pass
+                # freed slots are reused by insert; deleted rows still keyed wait for reclaim
+                for br in data.get("free", []):
+                    table._base.put(int(br), [0] * table._base.width)
+                    table._deleted[int(br)] = 1
+                    table._free_base.append(int(br))
+                for k, br in table._pk.items():
+                    if table._deleted[br]:
+                        table._pending_reclaim.append((k, br))
+
+                # secondary indexes: saved ones are read from their pages on first use,
+                # older files only list the columns and get rebuilt from the rows
+                for entry in data.get("indexes", []):
+                    if isinstance(entry, list) and len(entry) in (3, 4):
+                        column = [int(c) for c in entry[0]] if isinstance(entry[0], list) else int(entry[0])
+                        include = [int(c) for c in entry[3]] if len(entry) == 4 else ()
+                        table.index.attach_saved(self.bufferpool, column, entry[1], int(entry[2]), include)
+                        continue
+                    col, kind = entry if isinstance(entry, list) else (entry, "ordered")
+                    table.index.create_index(int(col), kind)
+
+                # Bloom filter over the keys, read back from its pages
+                if data.get("key_filter"):
+                    table._load_key_filter(self.bufferpool, data["key_filter"])
+
+                # bulk rebuild maintained range sums
+                for col in data.get("aggregates", []):
+                    table.create_aggregate(int(col))
 
                 self.tables.append(table)
                 self._tables_by_name[table.name] = table
@@ -142,10 +192,18 @@ class Database():
                 "key": table.key,
                 "next_base_rid": table._next_base_rid,
                 "next_tail_rid": table._next_tail_rid,
+                "rid_format": RID_FORMAT,
+                "ts_unit": TS_UNIT,
                 # store as list of pairs to avoid JSON dict key coercion
-                "rows": [[int(rid), row] for rid, row in table._rows.items()],
+                "rows": [[int(rid), row] for rid, row in table._iter_rows()],
                 "pk": [[int(k), int(br)] for k, br in table._pk.items()],
-                "deleted": [[int(br), bool(flag)] for br, flag in table._deleted.items()],
+                "deleted": [[br, True] for br in range(1, table._next_base_rid) if table._deleted[br]],
+                "free": table._free_base,
+                "aggregates": sorted(table._aggregates),
+                "key_filter": table._save_key_filter(self.bufferpool),
+                "indexes": table.index.save(self.bufferpool) if table.index else [],
+                "history": [[br, rows] for br, rows in table._iter_history()],
+                "retention": {"versions": table.retain_versions, "seconds": table.retain_seconds},
             }
             try:
                 with open(table_path, 'w') as tf:
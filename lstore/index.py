@@ -10,74 +10,448 @@ drop_index (optional for this milestone).
 """
 A data strucutre holding indices for various columns of a table. 
 Key column should be indexd by default, other columns can be indexed through this object. 
-Indices are usually B-Trees, but other data structures can be used as well.
+Each indexed column picks a kind: "ordered" (a B+ tree, lstore/bplustree.py) for columns
+searched by range, or "hash" (a dict) for columns only searched by equality. The key column
+is indexed by the table's primary key map and can get an ordered index for key ranges.
+Composite indexes cover an ordered tuple of columns: a B+ tree keyed by value tuples, which
+answers equality on a prefix of the columns plus a range on the next one.
+Any index can also include extra columns (a covering index): it then keeps the latest
+values of those columns for every record, so projections and aggregates over them are
+answered from the index without reading the records.
 """
 
-from lstore.BinaryTree import Tree
+from lstore.bplustree import BPlusTree
+from array import array
+
+INDEX_KINDS = ("hash", "ordered")
+
+# saved indexes are (value, rid) int64 entries packed into bufferpool pages
+PAGE_WORDS = 4096 // 8
+
+
+class HashIndex:
+    """
+    value -> list of base RIDs in a dict. Same interface as BPlusTree: equality is
+    O(1) with no ordering work on writes, range lookups visit every distinct value.
+    """
+    kind = "hash"
+    include = ()
+
+    def __init__(self):
+        self._map = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def build(self, pairs):
+        """Replace the contents with (key, rid) pairs."""
+        self._map = {}
+        self._size = 0
+        for key, rid in pairs:
+            self.insert(key, rid)
+
+    def insert(self, key, rid):
+        self._map.setdefault(key, []).append(rid)
+        self._size += 1
+
+    def delete(self, key, rid):
+        rids = self._map[key]
+        rids.remove(rid)
+        self._size -= 1
+        if not rids:
+            del self._map[key]
+
+    def get(self, key):
+        return list(self._map.get(key, ()))
+
+    def range(self, low=None, high=None):
+        for key in sorted(k for k in self._map if (low is None or k >= low) and (high is None or k <= high)):
+            yield key, self._map[key]
+
+    def items(self):
+        return self.range()
+
+
+class CoveringIndex:
+    """
+    A BPlusTree or HashIndex plus the values of the included columns of every
+    record it holds (base rid -> tuple in include order). The table sets them
+    with cover() on insert and on updates; deleting a record's entry drops them.
+    """
+
+    def __init__(self, index, include, payload=None):
+        self.index = index
+        self.kind = index.kind
+        self.include = tuple(include)
+        self.payload = payload if payload is not None else {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def cover(self, rid, values):
+        self.payload[rid] = values
+
+    def insert(self, key, rid):
+        self.index.insert(key, rid)
+
+    def delete(self, key, rid):
+        self.payload.pop(rid, None)
+        self.index.delete(key, rid)
+
+    def get(self, key):
+        return self.index.get(key)
+
+    def range(self, low=None, high=None):
+        return self.index.range(low, high)
+
+    def items(self):
+        return self.index.items()
+
+
+class SavedIndex:
+    """
+    An index written to bufferpool pages by Database.close. Nothing is read at open;
+    the pages are loaded and the index bulk built the first time it is used (read
+    or written), after that every call goes straight to the real index.
+    """
+
+    def __init__(self, kind, count, loader, include=()):
+        self.kind = kind
+        self.include = tuple(include)
+        self.count = count      # entries on disk
+        self._loader = loader
+        self._index = None
+
+    def loaded(self):
+        return self._index is not None
+
+    def _get(self):
+        if self._index is None:
+            self._index = self._loader()
+        return self._index
+
+    def __len__(self):
+        return len(self._get())
+
+    @property
+    def payload(self):
+        return self._get().payload
+
+    def cover(self, rid, values):
+        self._get().cover(rid, values)
+
+    def insert(self, key, rid):
+        self._get().insert(key, rid)
+
+    def delete(self, key, rid):
+        self._get().delete(key, rid)
+
+    def get(self, key):
+        return self._get().get(key)
+
+    def range(self, low=None, high=None):
+        return self._get().range(low, high)
+
+    def items(self):
+        return self._get().items()
+
 
 class Index:
 
     def __init__(self, table):
         # Store reference to table for num_columns and key
         self.table = table
-        # One tree per column: Tree() for BST with multi-keys (RIDs) per value
-        self.indices = []
-        for _ in range(table.num_columns):
-            self.indices.append(Tree())
-        # Primary key is already indexed (empty tree)
+        # One index per indexed column (BPlusTree or HashIndex): value -> base RIDs.
+        # None means no index. The key column is always indexed by the table's
+        # primary key map; indices[key] is only set for an ordered or covering key index.
+        self.indices = [None] * table.num_columns
+        # (column, column, ...) -> BPlusTree keyed by value tuples
+        self.composites = {}
+
+    def is_indexed(self, column):
+        return column == self.table.key or (0 <= column < len(self.indices) and self.indices[column] is not None)
+
+    def all_indexes(self):
+        """
+        Yield (columns, index) for every secondary index: columns is a column
+        number, or a tuple of them for a composite index.
+        """
+        for column, index in enumerate(self.indices):
+            if index is not None:
+                yield column, index
+        yield from self.composites.items()
+
+    def covering(self, columns):
+        """An index that includes every column in columns, None if there is none."""
+        columns = set(columns)
+        for _, index in self.all_indexes():
+            if index.include and columns <= set(index.include):
+                return index
+        return None
+
+    def _lookup(self, column):
+        # the index object for a column number or a tuple of columns, None if there is none
+        if isinstance(column, tuple):
+            return self.composites.get(column)
+        if 0 <= column < len(self.indices):
+            return self.indices[column]
+        return None
+
+    def kind(self, column):
+        """ "hash", "ordered" or None for a column without an index."""
+        if isinstance(column, (list, tuple)):
+            return "ordered" if tuple(column) in self.composites else None
+        if 0 <= column < len(self.indices) and self.indices[column] is not None:
+            return self.indices[column].kind
+        return "hash" if column == self.table.key else None
 
     """
     # returns the location of all records with the given value on column "column"
     """
 
     def locate(self, column, value):
-        if 0 <= column < len(self.indices):
-            node = self.indices[column].find_node(value)
-            return node.keys if node else []
+        if column == self.table.key:
+            rid = self.table._pk.get(value)
+            return [rid] if rid else []
+        if 0 <= column < len(self.indices) and self.indices[column] is not None:
+            return self.indices[column].get(value)
         return []
 
     """
     # Returns the RIDs of all records with values in column "column" between "begin" and "end"
+    # (either bound may be None for an open end). Ordered indexes return them in value order.
     """
 
     def locate_range(self, begin, end, column):
-        if 0 <= column < len(self.indices):
-            nodes = self.indices[column].find_node_range(begin, end)
+        if 0 <= column < len(self.indices) and self.indices[column] is not None:
             rids = []
-            for node in nodes:
-                if node:
-                    rids.extend(node.keys)
+            for _, value_rids in self.indices[column].range(begin, end):
+                rids.extend(value_rids)
             return rids
+        if column == self.table.key:
+            return [rid for k, rid in self.table._pk.items()
+                    if (begin is None or k >= begin) and (end is None or k <= end)]
         return []
 
+    """
+    # Returns the RIDs of the records whose columns start with the values in prefix, and
+    # whose next column (if low/high are given) is between low and high, using the
+    # composite index on columns. Either bound may be None for an open end.
+    """
+
+    def locate_prefix(self, columns, prefix, low=None, high=None):
+        tree = self.composites.get(tuple(columns))
+        if tree is None:
+            return []
+        prefix = tuple(prefix)
+        start = prefix if low is None else prefix + (low,)
+        # prefix + (x, inf) sorts after every key starting with prefix + (x,)
+        end = prefix + ((float("inf"),) if high is None else (high, float("inf")))
+        rids = []
+        for _, value_rids in tree.range(start, end):
+            rids.extend(value_rids)
+        return rids
+
     """
     # optional: Create index on specific column
+    # kind: "ordered" (B+ tree, equality and ranges) or "hash" (equality only, O(1))
+    # A list or tuple of columns makes an ordered composite index over them, in that order.
+    # include: extra columns whose latest values the index keeps (a covering index)
+    """
+
+    def create_index(self, column_number, kind="ordered", include=None):
+        include = tuple(include or ())
+        if not self._valid_columns(include):
+            return False
+        if isinstance(column_number, (list, tuple)):
+            return self._create_composite(tuple(column_number), kind, include)
+        if not (0 <= column_number < len(self.indices)) or kind not in INDEX_KINDS:
+            return False
+        current = self.indices[column_number]
+        if self.kind(column_number) == kind and (current.include if current is not None else ()) == include:
+            return True
+        if column_number == self.table.key and kind == "hash" and not include:
+            # the primary key map already is one
+            self.indices[column_number] = None
+            return True
+        # bulk build from the latest value of every live record (sorted once for a B+ tree)
+        if kind == "ordered":
+            index = BPlusTree()
+            index.build(self.table._sorted_column(column_number))
+        else:
+            index = HashIndex()
+            index.build((value, rid) for rid, value in self.table._live_column(column_number))
+        self.indices[column_number] = self._cover(index, include)
+        return True
+
+    def _create_composite(self, columns, kind, include):
+        if len(columns) == 1:
+            return self.create_index(columns[0], kind, include)
+        if kind != "ordered" or not columns or not self._valid_columns(columns):
+            return False
+        current = self.composites.get(columns)
+        if current is None or current.include != include:
+            tree = BPlusTree()
+            tree.build(self.table._sorted_columns(columns))
+            self.composites[columns] = self._cover(tree, include)
+        return True
+
+    def _valid_columns(self, columns):
+        # distinct column numbers of this table
+        return len(set(columns)) == len(columns) and all(0 <= c < len(self.indices) for c in columns)
+
+    def _cover(self, index, include):
+        # wrap a freshly built index with the current values of its included columns
+        if not include:
+            return index
+        return CoveringIndex(index, include, self.table._live_rows(include))
+
+    """
+    # Write every index to bufferpool pages (flushed with the other pages on close)
+    # Returns [column, kind, entries, include] for each saved index, for the table file
+    """
+
+    def save(self, bufferpool):
+        saved = []
+        for column, index in self.all_indexes():
+            entry = list(column) if isinstance(column, tuple) else column
+            if isinstance(index, SavedIndex) and not index.loaded():
+                # never used since open, so its pages are still current
+                saved.append([entry, index.kind, index.count, list(index.include)])
+                continue
+            # entries are (value, rid), or (value, value, ..., rid) for a composite,
+            # followed by the included values of a covering index
+            words = array('q')
+            count = 0
+            payload = index.payload if index.include else None
+            for value, rids in index.items():
+                for rid in rids:
+                    if isinstance(value, tuple):
+                        words.extend(value)
+                    else:
+                        words.append(value)
+                    words.append(rid)
+                    if payload is not None:
+                        words.extend(payload[rid])
+                    count += 1
+            segment = self._segment(column)
+            for page_idx, start in enumerate(range(0, len(words), PAGE_WORDS)):
+                chunk = words[start:start + PAGE_WORDS].tobytes()
+                page = bufferpool.get_page(self.table.name, 0, segment, page_idx, 0)
+                page.data[:len(chunk)] = chunk
+                bufferpool.release_page(self.table.name, 0, segment, page_idx, 0, modified=True)
+            saved.append([entry, index.kind, count, list(index.include)])
+        return saved
+
+    def _segment(self, column):
+        if isinstance(column, tuple):
+            return "index_" + "_".join(str(c) for c in column)
+        return f"index_{column}"
+
+    """
+    # Register an index saved by save(); its pages are only read on first use
     """
 
-    def create_index(self, column_number):
-        if self.indices[column_number] is None:
-            self.indices[column_number] = {}
+    def attach_saved(self, bufferpool, column, kind, count, include=()):
+        include = tuple(include)
+        if not self._valid_columns(include):
+            return False
+        if isinstance(column, (list, tuple)):
+            column = tuple(column)
+            if kind != "ordered" or not self._valid_columns(column):
+                return False
+        elif not (0 <= column < len(self.indices)) or kind not in INDEX_KINDS:
+            return False
+        key_width = len(column) if isinstance(column, tuple) else 1
+        width = key_width + 1 + len(include)
+
+        def load():
+            segment = self._segment(column)
+            words = array('q')
+            for page_idx in range(-(-(count * width) // PAGE_WORDS)):
+                page = bufferpool.get_page(self.table.name, 0, segment, page_idx, 0)
+                words.frombytes(bytes(page.data))
+                bufferpool.release_page(self.table.name, 0, segment, page_idx, 0)
+            del words[count * width:]
+            rids = words[key_width::width]
+            if key_width == 1:
+                values = words[0::width]
+            else:
+                values = zip(*(words[i::width] for i in range(key_width)))
+            index = BPlusTree() if kind == "ordered" else HashIndex()
+            index.build(zip(values, rids))
+            if not include:
+                return index
+            payload = zip(*(words[key_width + 1 + i::width] for i in range(len(include))))
+            return CoveringIndex(index, include, dict(zip(rids, payload)))
+
+        if isinstance(column, tuple):
+            self.composites[column] = SavedIndex(kind, count, load, include)
+        else:
+            self.indices[column] = SavedIndex(kind, count, load, include)
+        return True
 
     """
     # optional: Drop index of specific column
     """
 
     def drop_index(self, column_number):
-        if 0 <= column_number < len(self.indices):
-            self.indices[column_number] = Tree()  # Reset to new empty tree
+        if isinstance(column_number, (list, tuple)):
+            self.composites.pop(tuple(column_number), None)
+        elif 0 <= column_number < len(self.indices):
+            self.indices[column_number] = None
 
-    # Add a base RID for a value in a column
+    """
+    # Check every index against the table: each live record must be indexed under its
+    # latest value and nothing else may be, and a covering index must hold the latest values
+    # of its included columns. Returns a list of problems, empty if consistent:
+    # ("missing" | "stale" | "payload", column, value, rid)
+    """
+
+    def verify(self):
+        table = self.table
+        problems = []
+        deleted = table._deleted
+        for k, rid in table._pk.items():
+            if deleted[rid]:
+                continue
+            value = table._latest_value(rid, table.key)
+            if value != k:
+                problems.append(("stale", table.key, k, rid))
+        live = [rid for rid in range(1, table._next_base_rid) if not deleted[rid]]
+        for column, index in self.all_indexes():
+            expected = set((table._index_value(column, lambda c: table._latest_value(rid, c)), rid)
+                           for rid in live)
+            actual = set()
+            for value, rids in index.items():
+                actual.update((value, rid) for rid in rids)
+            problems.extend(("missing", column, value, rid) for value, rid in sorted(expected - actual))
+            problems.extend(("stale", column, value, rid) for value, rid in sorted(actual - expected))
+            if not index.include:
+                continue
+            payload = index.payload
+            for rid in live:
+                values = tuple(table._latest_value(rid, c) for c in index.include)
+                if payload.get(rid) != values:
+                    problems.append(("payload", column, values, rid))
+            problems.extend(("payload", column, payload[rid], rid) for rid in sorted(set(payload) - set(live)))
+        return problems
+
+    # Add a base RID for a value in a column (a value tuple for a composite index)
     def add(self, column, value, base_rid):
         if value is None:  # Skip NULLs/sentinels
             return
-        if 0 <= column < len(self.indices):
-            self.indices[column].insert(value, base_rid)
+        index = self._lookup(column)
+        if index is not None:
+            index.insert(value, base_rid)
 
-    # Remove a base RID for a value in a column
+    # Remove a base RID for a value in a column (a value tuple for a composite index)
     def remove(self, column, value, base_rid):
-        if value is None or not (0 <= column < len(self.indices)):
+        index = self._lookup(column)
+        if value is None or index is None:
             return
         try:
-            self.indices[column].delete(value, base_rid)
+            index.delete(value, base_rid)
         except (ValueError, KeyError):
-            pass  # Ignore if not found
\ No newline at end of file
+            pass  # Ignore if not found
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import threading
-from typing import Dict, Hashable, Optional, Set
+from typing import Dict, Hashable, Iterable, List, Optional, Set
 
 # transaction identifier (int)
 TxnId = int
@@ -26,6 +26,7 @@ class LockManager:
     Main functions that get called
     - acquire_s(txn, res): get a shared/read lock
     - acquire_x(txn, res): get an exclusive/write lock
+    - acquire_many(txn, resources, mode): lock a batch at once (bulk queries)
     - release_all(txn): drop all locks for that transaction
     """
 
@@ -44,16 +45,7 @@ class LockManager:
         Returns True if we got it, False if someone else has an exclusive lock.
         """
         with self._mu:
-            s_holders, x_holder = self._locks.setdefault(res, (set(), None))
-            
-            # can't get S lock if someone else has X lock
-            if x_holder is not None and x_holder != txn:
-                return False
-            
-            # add ourselves to the shared holders
-            s_holders.add(txn)
-            self._txn_to_resources.setdefault(txn, set()).add(res)
-            return True
+            return self._grant_s(txn, res)
 
     def acquire_x(self, txn: TxnId, res: ResourceId) -> bool:
         """
@@ -65,26 +57,17 @@ class LockManager:
         If we have S and want to upgrade to X, we can only do that if we're the only S holder
         """
         with self._mu:
-            s_holders, x_holder = self._locks.setdefault(res, (set(), None))
-            
-            # if already have X lock we're fine
-            if x_holder == txn:
-                self._txn_to_resources.setdefault(txn, set()).add(res)
-                return True
-            
-            # if someone else has X lock we cant get it
-            if x_holder is not None and x_holder != txn:
-                return False
-            
-            # trying to upgrade from S to X. only works if we're the only S holder
-            if s_holders and s_holders != {txn}:
-                return False
-            
-            # upgrade: remove ourselves from S holders, give ourselves X
-            s_holders.discard(txn)
-            self._locks[res] = (s_holders, txn)
-            self._txn_to_resources.setdefault(txn, set()).add(res)
-            return True
+            return self._grant_x(txn, res)
+
+    def acquire_many(self, txn: TxnId, resources: Iterable[ResourceId], mode: str = "X") -> List[bool]:
+        """
+        Lock a batch of resources under one trip through the mutex.
+        Returns one True/False per resource in the same order (no-wait, same rules as
+        acquire_s / acquire_x). Locks that were granted stay held even if others failed.
+        """
+        grant = self._grant_s if mode.upper() == "S" else self._grant_x
+        with self._mu:
+            return [grant(txn, res) for res in resources]
 
     def release_all(self, txn: TxnId) -> None:
         """
@@ -118,6 +101,50 @@ class LockManager:
                     # update the lock state
                     self._locks[res] = (s_holders, x_holder)
 
+    def is_locked(self, res: ResourceId) -> bool:
+        """True if any transaction holds an S or X lock on the resource."""
+        with self._mu:
+            state = self._locks.get(res)
+            return state is not None and (bool(state[0]) or state[1] is not None)
+
+    # ---------------------------------------------------------------
+    # Grant logic, caller must hold self._mu
+    # ---------------------------------------------------------------
+
+    def _grant_s(self, txn: TxnId, res: ResourceId) -> bool:
+        s_holders, x_holder = self._locks.setdefault(res, (set(), None))
+
+        # can't get S lock if someone else has X lock
+        if x_holder is not None and x_holder != txn:
+            return False
+
+        # add ourselves to the shared holders
+        s_holders.add(txn)
+        self._txn_to_resources.setdefault(txn, set()).add(res)
+        return True
+
+    def _grant_x(self, txn: TxnId, res: ResourceId) -> bool:
+        s_holders, x_holder = self._locks.setdefault(res, (set(), None))
+
+        # if already have X lock we're fine
+        if x_holder == txn:
+            self._txn_to_resources.setdefault(txn, set()).add(res)
+            return True
+
+        # if someone else has X lock we cant get it
+        if x_holder is not None and x_holder != txn:
+            return False
+
+        # trying to upgrade from S to X. only works if we're the only S holder
+        if s_holders and s_holders != {txn}:
+            return False
+
+        # upgrade: remove ourselves from S holders, give ourselves X
+        s_holders.discard(txn)
+        self._locks[res] = (s_holders, txn)
+        self._txn_to_resources.setdefault(txn, set()).add(res)
+        return True
+
     # ---------------------------------------------------------------
     # Convenience methods mostly ofr backward compatibility
     # ---------------------------------------------------------------
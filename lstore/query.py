@@ -48,18 +48,67 @@ class Query:
         return self.table.insert(*columns, txn_id=txn_id)
 
     
+    """
+    # Insert a batch of records, rows is a list of column lists
+    # Returns a list with True/False per row (same rules as insert)
+    """
+    def insert_many(self, rows, txn_id = None):
+        status = [False] * len(rows)
+        valid = [i for i, columns in enumerate(rows) if None not in columns]
+        results = self.table.insert_many([rows[i] for i in valid], txn_id=txn_id)
+        for i, ok in zip(valid, results):
+            status[i] = ok
+        return status
+
+    
     """
     # Read matching record with specified search key
     # :param search_key: the value you want to search based on
     # :param search_key_index: the column index you want to search based on
     # :param projected_columns_index: what columns to return. array of 1 or 0 values.
+    # :param lazy: return record views that only read the projected columns when .columns is used
     # Returns a list of Record objects upon success
     # Returns False if record locked by TPL
     # Assume that select will never be called on a key that doesn't exist
     """
-    def select(self, search_key, search_key_index, projected_columns_index, txn_id = None):
+    def select(self, search_key, search_key_index, projected_columns_index, txn_id = None, lazy = False):
         # Look up a record and only return requested columns
-        return self.table.select(search_key, search_key_index, projected_columns_index, txn_id = txn_id)
+        return self.table.select(search_key, search_key_index, projected_columns_index, txn_id = txn_id, lazy = lazy)
+
+    
+    """
+    # Read the records matching every predicate
+    # :param predicates: list of (column, op, value), op is one of "==", "<", "<=", ">", ">="
+    # :param projected_columns_index: what columns to return. array of 1 or 0 values.
+    # Returns a list of Record objects in key order upon success ([] if nothing matches)
+    # Returns False on a bad predicate or if a record is locked by TPL
+    """
+    def select_where(self, predicates, projected_columns_index, txn_id = None):
+        return self.table.select_where(predicates, projected_columns_index, txn_id = txn_id)
+
+    
+    """
+    # Read many records by primary key in one call
+    # :param search_keys: list of key values
+    # :param search_key_index: the column index you want to search based on (PK only)
+    # :param projected_columns_index: what columns to return. array of 1 or 0 values.
+    # Returns a list aligned with search_keys: a tuple of the projected values, or None if the key doesn't exist
+    # Returns False if any record is locked by TPL
+    """
+    def select_many(self, search_keys, search_key_index, projected_columns_index, txn_id = None):
+        return self.table.select_many(search_keys, search_key_index, projected_columns_index, txn_id = txn_id)
+
+    
+    """
+    # Walk every record with a key in [start_key, end_key] in key order
+    # :param projected_columns_index: what columns to return. array of 1 or 0 values.
+    # :param batch_size: records read per step
+    # :param columnar: yield one (keys, columns) pair per batch instead of one Record per record
+    # Returns a generator upon success
+    # Returns False if a record is locked by TPL
+    """
+    def scan(self, start_key, end_key, projected_columns_index, batch_size = 1024, columnar = False, txn_id = None):
+        return self.table.scan(start_key, end_key, projected_columns_index, batch_size = batch_size, columnar = columnar, txn_id = txn_id)
 
     
     """
@@ -72,9 +121,19 @@ class Query:
     # Returns False if record locked by TPL
     # Assume that select will never be called on a key that doesn't exist
     """
-    def select_version(self, search_key, search_key_index, projected_columns_index, relative_version, txn_id = None):
+    def select_version(self, search_key, search_key_index, projected_columns_index, relative_version, txn_id = None, lazy = False):
         # Same as select, but lets you ask for an older version (e.g., -1 = base, 0 = latest)
-        return self.table.select_version(search_key, search_key_index, projected_columns_index, relative_version)
+        return self.table.select_version(search_key, search_key_index, projected_columns_index, relative_version, lazy = lazy)
+
+    
+    """
+    # Read the version of a record that was current at a point in time
+    # :param as_of: timestamp from lstore.clock.now() (microseconds)
+    # Returns a list of Record objects upon success, [] if the record did not exist yet
+    # Returns False if record locked by TPL
+    """
+    def select_as_of(self, search_key, search_key_index, projected_columns_index, as_of, txn_id = None):
+        return self.table.select_as_of(search_key, search_key_index, projected_columns_index, as_of, txn_id = txn_id)
 
     
     """
@@ -87,6 +146,16 @@ class Query:
         return self.table.update(primary_key, *columns, txn_id = txn_id)
 
     
+    """
+    # Update many records in one call
+    # :param updates: list of (primary_key, columns) pairs, None leaves a column unchanged
+    # :param collapse: fold repeated updates to one key into a single new version
+    # Returns a list with True/False per pair (same rules as update)
+    """
+    def update_many(self, updates, txn_id = None, collapse = True):
+        return self.table.update_many(updates, txn_id = txn_id, collapse = collapse)
+
+    
     """
     :param start_range: int         # Start of the key range to aggregate 
     :param end_range: int           # End of the key range to aggregate 
@@ -114,20 +183,70 @@ class Query:
         return self.table.sum_version(start_range, end_range, aggregate_column_index, relative_version)
 
     
+    """
+    :param start_range: int         # Start of the key range to aggregate
+    :param end_range: int           # End of the key range to aggregate
+    :param aggregate_columns: int  # Index of desired column to aggregate
+    :param as_of: timestamp from lstore.clock.now() (microseconds)
+    # Returns the summation over the records as they were at as_of
+    """
+    def sum_as_of(self, start_range, end_range, aggregate_column_index, as_of, txn_id = None):
+        return self.table.sum_as_of(start_range, end_range, aggregate_column_index, as_of)
+
+    
+    """
+    :param start_range: int         # Start of the key range to count
+    :param end_range: int           # End of the key range to count
+    # Returns the number of records in the given range (0 if none)
+    """
+    def count(self, start_range, end_range, txn_id = None):
+        return self.table.count(start_range, end_range)
+
+    
+    """
+    :param start_range: int         # Start of the key range to aggregate 
+    :param end_range: int           # End of the key range to aggregate 
+    :param aggregate_columns: int  # Index of desired column to aggregate
+    # min/max/avg of one column over the range, computed inside the table in one scan
+    # The *_version variants take a relative_version like sum_version
+    # Returns False if no record exists in the given range
+    """
+    def min(self, start_range, end_range, aggregate_column_index, txn_id = None):
+        return self.table.min(start_range, end_range, aggregate_column_index)
+
+    def max(self, start_range, end_range, aggregate_column_index, txn_id = None):
+        return self.table.max(start_range, end_range, aggregate_column_index)
+
+    def avg(self, start_range, end_range, aggregate_column_index, txn_id = None):
+        return self.table.avg(start_range, end_range, aggregate_column_index)
+
+    def min_version(self, start_range, end_range, aggregate_column_index, relative_version, txn_id = None):
+        return self.table.min_version(start_range, end_range, aggregate_column_index, relative_version)
+
+    def max_version(self, start_range, end_range, aggregate_column_index, relative_version, txn_id = None):
+        return self.table.max_version(start_range, end_range, aggregate_column_index, relative_version)
+
+    def avg_version(self, start_range, end_range, aggregate_column_index, relative_version, txn_id = None):
+        return self.table.avg_version(start_range, end_range, aggregate_column_index, relative_version)
+
+    
+    """
+    # Read-modify-write of one record
+    # :param fns: one entry per column, None or a function old_value -> new_value
+    # Returns True if the record was rewritten
+    # Returns False if no record matches key or if target record is locked by 2PL.
+    """
+    def apply(self, key, fns, txn_id = None):
+        return self.table.apply(key, fns, txn_id = txn_id)
+
+    
     """
     incremenets one column of the record
-    this implementation should work if your select and update queries already work
     :param key: the primary of key of the record to increment
     :param column: the column to increment
     # Returns True is increment is successful
     # Returns False if no record matches key or if target record is locked by 2PL.
     """
     def increment(self, key, column, txn_id = None):
-         #Increase the value of a single column by 1
-        rows = self.select(key, self.table.key, [1] * self.table.num_columns)
-        if not rows:
-            return False
-        current_val = rows[0].columns[column]
-        updated_columns = [None] * self.table.num_columns
-        updated_columns[column] = current_val + 1
-        return self.update(key, *updated_columns)
+        # read and write happen inside the table under one X lock
+        return self.table.increment(key, column, 1, txn_id = txn_id)
@@ -0,0 +1,118 @@
+"""
+Column storage for table records. Every column (metadata and user columns alike)
+lives in fixed size pages of 64-bit integers, so a record costs 8 bytes per column
+instead of a Python list of boxed ints. Rows are addressed by their offset in the
+store; offset -> (page, slot) is plain arithmetic. Pages are never resized once
+allocated, which keeps them safe to view from numpy while other rows are appended.
+
+RIDs are structured 64-bit values that spell out where a record lives:
+
+    bit 62       tail segment
+    bit 61       history segment (merged-away versions, see Table.__merge)
+    bits 13-60   page range
+    bits 9-12    page within the range (PAGES_PER_RANGE pages)
+    bits 0-8     slot within the page (PAGE_SLOTS slots)
+
+A rid with neither segment bit is a base record. Bits 0-60 together are the row
+offset in the segment's ColumnStore, so finding a record is a mask, and there is
+room for 2^61 rows per segment.
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only gather() uses it
+    np = None
+
+# one page = 4096 bytes = 512 int64 slots
+PAGE_BITS = 9
+PAGE_SLOTS = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SLOTS - 1
+
+_ZERO_PAGE = bytes(PAGE_SLOTS * 8)
+
+# pages per page range
+RANGE_BITS = 4
+PAGES_PER_RANGE = 1 << RANGE_BITS
+
+TAIL_SEGMENT = 1 << 62
+HISTORY_SEGMENT = 1 << 61
+OFFSET_MASK = HISTORY_SEGMENT - 1
+
+
+def is_tail_rid(rid: int) -> bool:
+    return bool(rid & TAIL_SEGMENT)
+
+
+class ColumnStore:
+    """
+    - pages[col] is a list of array('q') pages, each PAGE_SLOTS long.
+    - flags holds one byte per row (the table uses it for the deleted bit).
+    - size is the number of rows handed out; capacity grows one page at a time.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self.pages = [[] for _ in range(width)]
+        self.flags = bytearray()
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, size: int):
+        while len(self.flags) < size:
+            for col_pages in self.pages:
+                col_pages.append(array('q', _ZERO_PAGE))
+            self.flags.extend(bytes(PAGE_SLOTS))
+
+    def append(self, row) -> int:
+        """Store a new row (one value per column) and return its offset."""
+        off = self.size
+        self.put(off, row)
+        return off
+
+    def put(self, off: int, row):
+        """Write a full row at offset off, growing the store if needed."""
+        if off >= self.size:
+            self._reserve(off + 1)
+            self.size = off + 1
+        page, slot = off >> PAGE_BITS, off & PAGE_MASK
+        for col_pages, v in zip(self.pages, row):
+            col_pages[page][slot] = v
+
+    def get(self, off: int, col: int) -> int:
+        return self.pages[col][off >> PAGE_BITS][off & PAGE_MASK]
+
+    def set(self, off: int, col: int, value: int):
+        self.pages[col][off >> PAGE_BITS][off & PAGE_MASK] = value
+
+    def row(self, off: int, start: int = 0, stop: int = None):
+        """Columns [start, stop) of one row as a list."""
+        page, slot = off >> PAGE_BITS, off & PAGE_MASK
+        pages = self.pages[start:stop]
+        return [p[page][slot] for p in pages]
+
+    def gather(self, col: int, offsets):
+        """
+        numpy only: int64 array with column col for each offset (an int64 array).
+        Offsets are grouped by page so each page is read with one vectorized take.
+        """
+        n = len(offsets)
+        out = np.empty(n, dtype=np.int64)
+        if n == 0:
+            return out
+        order = np.argsort(offsets, kind="stable")
+        offs = offsets[order]
+        page_ids = offs >> PAGE_BITS
+        cuts = (np.flatnonzero(np.diff(page_ids)) + 1).tolist()
+        col_pages = self.pages[col]
+        for a, b in zip([0] + cuts, cuts + [n]):
+            page = np.frombuffer(col_pages[int(page_ids[a])], dtype=np.int64)
+            out[order[a:b]] = page[offs[a:b] & PAGE_MASK]
+        return out
+
+    def nbytes(self) -> int:
+        """Bytes held by pages and flags (capacity, not just used rows)."""
+        return sum(len(p) * 8 for col_pages in self.pages for p in col_pages) + len(self.flags)
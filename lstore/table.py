@@ -1,5 +1,17 @@
 from lstore.index import Index
-from time import time
+from lstore.aggregate import SumIndex
+from lstore.bloom import BloomFilter
+from lstore.storage import ColumnStore, TAIL_SEGMENT, HISTORY_SEGMENT, OFFSET_MASK
+from lstore.clock import CLOCK
+from bisect import bisect_right
+from array import array
+import threading
+from sys import getsizeof
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, aggregates fall back to plain Python
+    np = None
 
 INDIRECTION_COLUMN = 0
 RID_COLUMN = 1
@@ -7,9 +19,20 @@ TIMESTAMP_COLUMN = 2
 SCHEMA_ENCODING_COLUMN = 3
 META_COLS = 4
 
+# tail records only: offset of their first value in the tail value heap
+TAIL_VALUES_COLUMN = 4
+
+# structured rids (see lstore/storage.py): base rids count up from 1 (0 means
+# "no record"), tail rids carry the tail segment bit and count up from it
+TAIL_RID_START = TAIL_SEGMENT
+
+# bytes of a bufferpool page (lstore/page.py)
+PAGE_BYTES = 4096
+
 
 
 class Record:
+    __slots__ = ("rid", "key", "columns", "schema_encoding")
 
     def __init__(self, rid, key, schema_encoding, columns):
         self.rid = rid
@@ -21,6 +44,51 @@ class Record:
         return f"Record(rid={self.rid}, key={self.key}, columns={self.columns})"
 
 
+class LazyRecord:
+    """
+    Record view returned by select(..., lazy=True). The version is pinned when the
+    view is made (tail records never change) but no column is read until .columns
+    is first used, and then only the projected ones. Reading a view raises
+    LookupError once what it pinned is gone: the table was merged since (merge
+    rewrites base rows and hands tail rids out again), or the record was freed
+    (its slot may hold another record).
+    """
+    __slots__ = ("rid", "key", "schema_encoding", "_table", "_start", "_projected", "_columns",
+                 "_generation", "_epoch")
+
+    def __init__(self, table, rid, key, schema_encoding, start, projected_columns):
+        self.rid = rid
+        self.key = key
+        self.schema_encoding = schema_encoding
+        self._table = table
+        self._start = start
+        self._projected = projected_columns
+        self._columns = None
+        self._generation = table._generations.get(rid, 0)
+        self._epoch = table._merge_epoch
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            if self._table._merge_epoch != self._epoch:
+                raise LookupError(f"table {self._table.name} was merged after this view of record {self.key} was made")
+            if self._table._generations.get(self.rid, 0) != self._generation:
+                raise LookupError(f"record {self.key} was deleted and freed after this view was made")
+            wanted = [c for c, sel in enumerate(self._projected) if sel]
+            cols = [None] * len(self._projected)
+            if len(wanted) == 1:
+                cols[wanted[0]] = self._table._value_at(self.rid, self._start, wanted[0])
+            elif wanted:
+                vals = self._table._values_at(self.rid, self._start)
+                for c in wanted:
+                    cols[c] = vals[c]
+            self._columns = cols
+        return self._columns
+
+    def __repr__(self):
+        return f"Record(rid={self.rid}, key={self.key}, columns={self.columns})"
+
+
 """
 The Table class provides the core of our relational storage functionality. All columns are 64-bit
 integers in this implementation. Users mainly interact with tables through queries. Tables provide
@@ -32,11 +100,16 @@ the periodical merge of its corresponding page ranges.
 class Table:
     """
     - single threaded, in memory L-store layout.
-    - Base records hold full row. tail records hold snapshot + schema bitmask
+    - Base records hold full row. tail records hold only the columns in their schema bitmask
+      (packed in the tail value heap) and are read by walking the chain from newest to oldest
     - Base.indirection -> newest tail RID (0 if none)
     - Tail.indirection -> previous tail RID (0 if none)
-    - No physical page object usage for M1. We emulate via in-memory rows + a directory.
-    - Binary tree Index hooks (optional)
+    - Records live column-wise in two ColumnStores (base and tail) of int64 pages.
+      rids are structured (segment | page range | page | slot), so
+      rid -> (store, offset) is the tail bit and rid & OFFSET_MASK, no per-record dict or list.
+    - Merge folds tails into the base row and keeps older versions, up to the
+      retention horizon, as full rows in a history store.
+    - Secondary indexes (B+ trees, lstore/index.py) are kept in step with every write
     """
     """
     :param name: string         #Table name
@@ -52,24 +125,63 @@ class Table:
         self.lock_manager = lock_manager
         # RIDs
         self._next_base_rid = 1
-        self._next_tail_rid = 1_000_000_000
+        self._next_tail_rid = TAIL_RID_START
+        # short-term latch for rid allocation and page/heap appends. 2PL locks keep
+        # writers off the same record, this keeps them off the shared storage
+        self._latch = threading.Lock()
 
         # in memory storage
-        # rid -> row = [indirection, rid, timestamp, schema_mask, *user_values]
-        self._rows = {}
+        # base row = [indirection, rid, timestamp, schema_mask, *user_values]
+        # tail row = [indirection, rid, timestamp, schema_mask, values_offset]; the values of
+        #            the columns set in schema_mask sit in order at _tail_values[values_offset:]
+        # base rid == offset in _base (offset 0 is reserved), tail rid & OFFSET_MASK == offset in _tail
+        # the newest tail of a base record is its indirection column
+        self._base = ColumnStore(META_COLS + num_columns)
+        self._tail = ColumnStore(META_COLS + 1)
+        self._tail_values = ColumnStore(1)
+        self._base.append([0] * (META_COLS + num_columns))
 
-        # base_rid -> newest tail rid (0 if none)
-        self._head = {}
+        # versions older than the base row that merge kept, as full rows
+        # [timestamp, *user_values]. Each record's versions are contiguous, oldest
+        # first: base rid -> (first offset, count). Rebuilt by every merge.
+        self._history = ColumnStore(1 + num_columns)
+        self._history_dir = {}
+        # retention horizon applied by merge: at most retain_versions old versions
+        # per record, and only those current within the last retain_seconds.
+        # None means no limit; retain_versions=0 keeps no history.
+        self.retain_versions = None
+        self.retain_seconds = None
 
         # pk -> base rid
         self._pk = {}
 
-        # base rid true if logically deleted
-        self._deleted = {}
+        # base rid -> 1 if logically deleted (one byte per base record)
+        self._deleted = self._base.flags
+
+        # deleted records not yet physically freed: (key, base rid)
+        self._pending_reclaim = []
+        # freed base rids, reused by insert before new rids are handed out
+        self._free_base = []
+        # base rid -> times its slot was freed, so lazy views can tell that their
+        # record is gone (only freed slots have an entry)
+        self._generations = {}
+        # bumped by every merge, which invalidates pinned versions (see LazyRecord)
+        self._merge_epoch = 0
 
         self.allrecords = {} 
 
-        # Optional Index (binary tree). This file does not depend on it.
+        # column -> SumIndex, only for columns with a maintained range sum
+        self._aggregates = {}
+
+        # Bloom filter over the keys in _pk (create_key_filter), None if not kept.
+        # Lookups of keys it rules out never reach _pk
+        self._key_filter = None
+
+        # base rid -> ([tail timestamps], [tail rids]) oldest first, built on the
+        # first as_of read of a record and extended by every later update
+        self._ts_index = {}
+
+        # Secondary indexes (B+ trees). The key column is indexed by _pk.
         try:
             self.index = Index(self)
         except Exception:
@@ -77,118 +189,231 @@ class Table:
 
     # helpers
     def _now(self) -> int:
-        return int(time())
+        # microsecond hybrid logical clock shared by all tables (lstore/clock.py)
+        return CLOCK.now()
 
     def _compose_row(self, indirection: int, rid: int, ts: int, schema: int, user_cols):
         return [indirection, rid, ts, schema] + user_cols
 
+    def _version_start(self, base_rid: int, relative_version: int = 0) -> int:
+        """
+        Newest tail rid that belongs to a version (0 if the version is the base row,
+        a history rid if it is one of the versions merge kept):
+          0 -> newest tail, -1 -> oldest version kept, -k -> skip the newest (k-1) versions
+        """
+        head = self._base.get(base_rid, INDIRECTION_COLUMN)
+        hist = self._history_dir.get(base_rid)
+        if relative_version == -1:
+            return HISTORY_SEGMENT | hist[0] if hist else 0
+        tail = self._tail
+        cur = head
+        steps = (-relative_version) - 1 if relative_version < 0 else 0
+        while steps and cur:
+            cur = tail.get(cur & OFFSET_MASK, INDIRECTION_COLUMN)
+            steps -= 1
+        if cur:
+            return cur
+        # past the base row the remaining steps go back through the history
+        if steps and hist:
+            first, count = hist
+            return HISTORY_SEGMENT | (first + max(0, count - steps))
+        return 0
+
+    def _values_at(self, base_rid: int, start: int):
+        """
+        User values of base_rid as of tail rid start (0 -> base row). Walks from
+        start toward older tails taking each column from the newest tail that set
+        it, and stops once every column ever updated (base schema) is filled.
+        A history rid is a full row and is read directly.
+        """
+        if start & HISTORY_SEGMENT:
+            return self._history.row(start & OFFSET_MASK, 1)
+        n = self.num_columns
+        values = self._base.row(base_rid, META_COLS)
+        need = self._base.get(base_rid, SCHEMA_ENCODING_COLUMN)
+        tail = self._tail
+        heap = self._tail_values
+        filled = 0
+        cur = start
+        while cur and need & ~filled:
+            off = cur & OFFSET_MASK
+            schema = tail.get(off, SCHEMA_ENCODING_COLUMN)
+            new = schema & ~filled
+            if new:
+                pos = tail.get(off, TAIL_VALUES_COLUMN)
+                for c in range(n):
+                    if (schema >> c) & 1:
+                        if (new >> c) & 1:
+                            values[c] = heap.get(pos, 0)
+                        pos += 1
+                filled |= new
+            cur = tail.get(off, INDIRECTION_COLUMN)
+        return values
+
+    def _value_at(self, base_rid: int, start: int, column_index: int) -> int:
+        """
+        One user column of base_rid as of tail rid start (0 -> base row).
+        """
+        if start & HISTORY_SEGMENT:
+            return self._history.get(start & OFFSET_MASK, 1 + column_index)
+        bit = 1 << column_index
+        if self._base.get(base_rid, SCHEMA_ENCODING_COLUMN) & bit:
+            tail = self._tail
+            cur = start
+            while cur:
+                off = cur & OFFSET_MASK
+                schema = tail.get(off, SCHEMA_ENCODING_COLUMN)
+                if schema & bit:
+                    pos = tail.get(off, TAIL_VALUES_COLUMN) + (schema & (bit - 1)).bit_count()
+                    return self._tail_values.get(pos, 0)
+                cur = tail.get(off, INDIRECTION_COLUMN)
+        return self._base.get(base_rid, META_COLS + column_index)
+
+    def _version_times(self, base_rid: int):
+        """
+        ([timestamps], [tail rids]) of base_rid's tail chain, oldest first.
+        """
+        entry = self._ts_index.get(base_rid)
+        if entry is None:
+            with self._latch:
+                times, rids = [], []
+                tail = self._tail
+                cur = self._base.get(base_rid, INDIRECTION_COLUMN)
+                while cur:
+                    off = cur & OFFSET_MASK
+                    times.append(tail.get(off, TIMESTAMP_COLUMN))
+                    rids.append(cur)
+                    cur = tail.get(off, INDIRECTION_COLUMN)
+                times.reverse()
+                rids.reverse()
+                entry = self._ts_index[base_rid] = (times, rids)
+        return entry
+
+    def _as_of_start(self, base_rid: int, as_of: int):
+        """
+        Newest tail rid written at or before as_of (0 -> the base row, or a history
+        rid), found by binary search over the record's version timestamps. None if
+        the record did not exist yet at as_of (or that part of its history is gone).
+        """
+        if self._base.get(base_rid, TIMESTAMP_COLUMN) > as_of:
+            hist = self._history_dir.get(base_rid)
+            if not hist:
+                return None
+            # history timestamps ascend within a record: find the last one <= as_of
+            first, count = hist
+            lo, hi = first, first + count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._history.get(mid, 0) <= as_of:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return HISTORY_SEGMENT | (lo - 1) if lo > first else None
+        times, rids = self._version_times(base_rid)
+        i = bisect_right(times, as_of)
+        return rids[i - 1] if i else 0
+
+    def _latest_value(self, base_rid: int, column_index: int) -> int:
+        return self._value_at(base_rid, self._base.get(base_rid, INDIRECTION_COLUMN), column_index)
+
     def _latest_view(self, base_rid: int):
         """
         Return (latest_values_list, latest_schema_mask) for the given base rid.
+        The base schema column accumulates every tail's mask.
         """
-        base = self._rows[base_rid]
-        values = base[META_COLS: META_COLS + self.num_columns][:]
-        # Keep track of which columns have ever been updated
-        schema_accum = base[SCHEMA_ENCODING_COLUMN]
-        
-        # Collect all tail records in order (newest to oldest)
-        tail_chain = []
-        cur = base[INDIRECTION_COLUMN]
-        while cur:
-            tail_chain.append(cur)
-            cur = self._rows[cur][INDIRECTION_COLUMN]
-        
-        # Apply tails from oldest to newest (reverse order)
-        # This ensures newer updates overwrite older ones
-        for tail_rid in reversed(tail_chain):
-            t = self._rows[tail_rid]
-            schema = t[SCHEMA_ENCODING_COLUMN]
-            tvals = t[META_COLS: META_COLS + self.num_columns]
-            for i in range(self.num_columns):
-                if (schema >> i) & 1:
-                    values[i] = tvals[i]
-            schema_accum |= schema
-        
-        return values, schema_accum
+        base = self._base
+        return (self._values_at(base_rid, base.get(base_rid, INDIRECTION_COLUMN)),
+                base.get(base_rid, SCHEMA_ENCODING_COLUMN))
 
     def _version_view(self, base_rid: int, relative_version: int):
         """
         Compute a historical snapshot:
           0   -> latest
-         -1   -> base only
-         -k   -> apply all tails except the newest (k-1) tails
-        Returns (values, schema_mask_applied_up_to_that_point)
+         -1   -> oldest version kept (the base row if nothing was merged)
+         -k   -> skip the newest (k-1) versions
+        Returns (values, schema_mask)
         """
-        base = self._rows[base_rid]
-        base_vals = base[META_COLS: META_COLS + self.num_columns][:]
-        base_schema = base[SCHEMA_ENCODING_COLUMN]
+        return (self._values_at(base_rid, self._version_start(base_rid, relative_version)),
+                self._base.get(base_rid, SCHEMA_ENCODING_COLUMN))
 
-        # Build lineage newest->older
-        lineage = []
-        cur = base[INDIRECTION_COLUMN]
-        while cur:
-            lineage.append(cur)
-            cur = self._rows[cur][INDIRECTION_COLUMN]
+    # secondary index hooks (the key column is indexed by _pk itself)
+    @staticmethod
+    def _index_value(columns, value_of):
+        # what an index on columns (a column number or tuple of them) stores for a record
+        if isinstance(columns, tuple):
+            return tuple([value_of(c) for c in columns])
+        return value_of(columns)
 
-        if relative_version == -1:
-            return base_vals, base_schema
-        if relative_version == 0:
-            return self._latest_view(base_rid)
-
-        if relative_version < 0:
-            skip_newest_n = (-relative_version) - 1  #e.g. -2 => skip newest 1
-            tails = lineage[::-1]  # oldest -> newest
-            if skip_newest_n > 0:
-                tails = tails[:-skip_newest_n]
-            vals = base_vals[:]
-            schema_accum = base_schema
-            for tr in tails:
-                t = self._rows[tr]
-                schema = t[SCHEMA_ENCODING_COLUMN]
-                tvals = t[META_COLS: META_COLS + self.num_columns]
-                for i in range(self.num_columns):
-                    if (schema >> i) & 1:
-                        vals[i] = tvals[i]
-                schema_accum |= schema
-            return vals, schema_accum
-
-        # Positive versions are not used in M1. treat as latest
-        return self._latest_view(base_rid)
-
-    # optional index hooks 
-    def _index_add_pk(self, key_val: int, base_rid: int):
+    def _index_add(self, base_rid: int, values):
         if self.index is None:
             return
-        try:
-            # Dictionary style fallback
-            if getattr(self.index, "indices", None) is not None:
-                if self.index.indices[self.key] is None:
-                    self.index.create_index(self.key)
-                self.index.indices[self.key].setdefault(key_val, []).append(base_rid)
-            else:
-                # Plug in binary tree insert here later if needed
-                pass
-        except Exception:
-            pass
+        for columns, index in self.index.all_indexes():
+            index.insert(self._index_value(columns, values.__getitem__), base_rid)
+            if index.include:
+                index.cover(base_rid, tuple([values[c] for c in index.include]))
 
-    def _index_remove_pk(self, key_val: int, base_rid: int):
+    def _index_remove(self, base_rid: int):
+        # drop the record's latest values from every secondary index (caller holds self._latch)
         if self.index is None:
             return
-        try:
-            if getattr(self.index, "indices", None) is not None:
-                d = self.index.indices[self.key]
-                if d is None:
-                    return
-                lst = d.get(key_val, [])
-                if base_rid in lst:
-                    lst.remove(base_rid)
-                if not lst and key_val in d:
-                    del d[key_val]
-            else:
-                # integrate with your binary tree delete API later
-                pass
-        except Exception:
-            pass
+        for columns, _ in self.index.all_indexes():
+            self.index.remove(columns, self._index_value(columns, lambda c: self._latest_value(base_rid, c)), base_rid)
+
+    def _sorted_column(self, column_index: int):
+        """
+        (latest value, base rid) of every live record, sorted by value then rid.
+        With numpy the column is gathered and sorted vectorized.
+        """
+        deleted = self._deleted
+        rids = [rid for rid in range(1, self._next_base_rid) if not deleted[rid]]
+        values = self._column_values(rids, column_index)
+        if np is None:
+            if all(a <= b for a, b in zip(values, values[1:])):
+                return zip(values, rids)  # already in order, e.g. keys inserted ascending
+            # group first (rids arrive in order), then only the distinct values need sorting
+            groups = {}
+            for value, rid in zip(values, rids):
+                groups.setdefault(value, []).append(rid)
+            return ((value, rid) for value in sorted(groups) for rid in groups[value])
+        rids = np.array(rids, dtype=np.int64)
+        order = np.lexsort((rids, values))
+        return zip(values[order].tolist(), rids[order].tolist())
+
+    def _sorted_columns(self, columns):
+        """
+        (tuple of latest values of columns, base rid) for every live record,
+        sorted by the value tuple then rid. Feeds composite index builds.
+        """
+        deleted = self._deleted
+        rids = [rid for rid in range(1, self._next_base_rid) if not deleted[rid]]
+        cols = [self._column_values(rids, c) for c in columns]
+        if np is None:
+            return sorted(zip(zip(*cols), rids))
+        rids = np.array(rids, dtype=np.int64)
+        order = np.lexsort([rids] + cols[::-1])
+        return zip(zip(*[col[order].tolist() for col in cols]), rids[order].tolist())
+
+    def _live_rows(self, columns):
+        """
+        {base rid: tuple of the latest values of columns} for every live record.
+        Fills the included columns of a covering index.
+        """
+        deleted = self._deleted
+        rids = [rid for rid in range(1, self._next_base_rid) if not deleted[rid]]
+        cols = [self._column_values(rids, c) for c in columns]
+        if np is not None:
+            cols = [col.tolist() for col in cols]
+        return dict(zip(rids, zip(*cols)))
+
+    def _live_column(self, column_index: int):
+        """
+        Yield (base rid, latest value of column_index) for every live record.
+        """
+        deleted = self._deleted
+        for rid in range(1, self._next_base_rid):
+            if not deleted[rid]:
+                yield rid, self._latest_value(rid, column_index)
+
     def lock(self, txn_id, rid, mode="X"):
         """
         Acquire a lock on a resource (rid).
@@ -202,6 +427,15 @@ class Table:
         else:  # mode = X
             return self.lock_manager.acquire_x(txn_id, rid)
     
+    def lock_many(self, txn_id, rids, mode="X"):
+        """
+        Lock a batch of resources in one lock manager call.
+        Returns a list of True/False, one per resource.
+        """
+        if txn_id == None or self.lock_manager is None:
+            return [True] * len(rids)
+        return self.lock_manager.acquire_many(txn_id, rids, mode)
+
     def unlock(self, txn_id, rid):
         if txn_id != None:
             self.lock_manager.release(txn_id, rid)
@@ -219,54 +453,427 @@ class Table:
         if not self.lock(txn_id, key_val, mode="X"):
             return False  # lock conflict, transaction should abort
         
-        if key_val in self._pk:
+        kf = self._key_filter
+        if (kf is None or key_val in kf) and key_val in self._pk:
             return False  # reject duplicate primary keys
 
+        with self._latch:
+            rid = self._new_base_rid()
+            self._base.put(rid, self._compose_row(0, rid, self._now(), 0, list(columns)))
+            self._deleted[rid] = 0
+            self._pk[key_val] = rid
+            self._key_filter_add(key_val)
+            self._index_add(rid, columns)
+            for col, agg in self._aggregates.items():
+                agg.add(key_val, columns[col])
+        return True
+
+    def insert_many(self, rows, txn_id=None):
+        """
+        Insert a batch of base records. Returns one True/False per row, same rules
+        as insert (wrong arity, duplicate PK or lock conflict -> False). Locks are
+        taken in one call, rids are handed out as one block and every row shares
+        one timestamp.
+        """
+        n = self.num_columns
+        status = [False] * len(rows)
+        batch = [i for i, cols in enumerate(rows) if len(cols) == n]
+        keys = [rows[i][self.key] for i in batch]
+        granted = self.lock_many(txn_id, keys, mode="X")
+
+        accepted = []
+        seen = set()
+        kf = self._key_filter
+        for i, key_val, ok in zip(batch, keys, granted):
+            absent = (kf is not None and key_val not in kf) or key_val not in self._pk
+            if ok and absent and key_val not in seen:
+                seen.add(key_val)
+                accepted.append(i)
+
+        with self._latch:
+            # freed slots first, then one block of fresh rids
+            reused = self._free_base[-len(accepted):] if accepted else []
+            del self._free_base[len(self._free_base) - len(reused):]
+            rids = reused[::-1] + list(range(self._next_base_rid, self._next_base_rid + len(accepted) - len(reused)))
+            self._next_base_rid += len(accepted) - len(reused)
+            now = self._now()
+            for i, rid in zip(accepted, rids):
+                cols = list(rows[i])
+                key_val = cols[self.key]
+                self._base.put(rid, [0, rid, now, 0] + cols)
+                self._deleted[rid] = 0
+                self._pk[key_val] = rid
+                self._key_filter_add(key_val)
+                self._index_add(rid, cols)
+                for col, agg in self._aggregates.items():
+                    agg.add(key_val, cols[col])
+                status[i] = True
+        return status
+
+    def _new_base_rid(self) -> int:
+        # caller holds self._latch
+        if self._free_base:
+            return self._free_base.pop()
         rid = self._next_base_rid
         self._next_base_rid += 1
+        return rid
 
-        row = self._compose_row(0, rid, self._now(), 0, list(columns))
-        self._rows[rid] = row
-        self._head[rid] = 0
-        self._pk[key_val] = rid
-        self._deleted[rid] = False
-        self._index_add_pk(key_val, rid)
-        return True
-
-    def select(self, search_key: int, search_key_index: int, projected_columns, txn_id = None ) -> bool:
+    def select(self, search_key: int, search_key_index: int, projected_columns, txn_id = None, lazy=False) -> bool:
         """
-        Return [Record] for search_key == key on the PK column (M1 only supports PK lookups).
+        Return [Record] for the records whose search_key_index column equals search_key.
+        The key column is looked up in the primary key map; any other column, or a
+        tuple of columns with one value each in search_key, goes through select_where.
         projected_columns: list of 0/1 (length == num_columns)
+        lazy=True returns LazyRecords that read their columns on first access.
         """
-        if search_key_index != self.key:
-            return []
+        if isinstance(search_key_index, (list, tuple)):
+            # several columns at once: search_key holds one value per column
+            if len(search_key) != len(search_key_index):
+                return []
+            predicates = [(c, "==", v) for c, v in zip(search_key_index, search_key)]
+        elif search_key_index != self.key:
+            predicates = [(search_key_index, "==", search_key)]
+        else:
+            predicates = None
+        if predicates is not None:
+            if not lazy:
+                return self.select_where(predicates, projected_columns, txn_id=txn_id)
+            # find the matches without reading any column, the views read them later
+            matches = self.select_where(predicates, [0] * self.num_columns, txn_id=txn_id)
+            if matches is False:
+                return False
+            return [self._lazy_record(r.rid, r.key, 0, projected_columns) for r in matches]
+        if self._key_filter is not None and search_key not in self._key_filter:
+            return []  # definitely absent
         base_rid = self._pk.get(search_key)
-        if not base_rid or self._deleted.get(base_rid, False):
+        if not base_rid or self._deleted[base_rid]:
             return []
         # Getshared (S) lock for read operation
         if not self.lock(txn_id, search_key, mode="S"):
             return False  #lock conflict. transaction should abort
+        if lazy:
+            return [self._lazy_record(base_rid, search_key, 0, projected_columns)]
         vals, schema_mask = self._latest_view(base_rid)
         projected = [v if sel else None for v, sel in zip(vals, projected_columns)]
         # Note: In strict 2PL locks are not released here. they're held until commit/abort
         return [Record(base_rid, search_key, schema_mask, projected)]
 
-    def select_version(self, search_key: int, search_key_index: int, projected_columns, relative_version: int):
+    def select_where(self, predicates, projected_columns, txn_id=None):
+        """
+        Filtered select. predicates is a conjunction of (column, op, value) with op
+        one of "==", "<", "<=", ">", ">=". The engine picks candidates from the
+        primary key when the key column is constrained (otherwise every live
+        record), then checks one predicate column at a time over the survivors,
+        and reads only the projected columns of the matches. If a covering index
+        includes every column still needed, the records are not read at all.
+        Returns [Record] in key order, False on a bad predicate or lock conflict.
+        """
+        ranges = self._predicate_ranges(predicates)
+        if ranges is None:
+            return False
+        rids, checked = self._candidate_rids(ranges)
+        if self.index is not None:
+            needed = [c for c in ranges if c not in checked]
+            projected = [c for c, sel in enumerate(projected_columns) if sel]
+            covering = self.index.covering(needed + [self.key] + projected)
+            if covering is not None:
+                return self._select_covered(covering, rids, ranges, needed, projected_columns, txn_id)
+        for col, (lo, hi) in ranges.items():
+            if not rids:
+                break
+            if col in checked:
+                continue
+            values = self._column_values(rids, col)
+            if np is not None:
+                mask = np.ones(len(rids), dtype=bool)
+                if lo is not None:
+                    mask &= values >= lo
+                if hi is not None:
+                    mask &= values <= hi
+                rids = [rids[i] for i in np.flatnonzero(mask).tolist()]
+            else:
+                rids = [rid for rid, v in zip(rids, values)
+                        if (lo is None or v >= lo) and (hi is None or v <= hi)]
+        if not rids:
+            return []
+
+        keys = [int(k) for k in self._column_values(rids, self.key)]
+        if not all(self.lock_many(txn_id, keys, mode="S")):
+            return False  # lock conflict. transaction should abort
+        cols = [self._column_values(rids, c) if sel else None for c, sel in enumerate(projected_columns)]
+        out = []
+        for i, rid in enumerate(rids):
+            out.append(Record(rid, keys[i], self._base.get(rid, SCHEMA_ENCODING_COLUMN),
+                              [int(col[i]) if col is not None else None for col in cols]))
+        out.sort(key=lambda r: r.key)
+        return out
+
+    def _select_covered(self, index, rids, ranges, needed, projected_columns, txn_id):
+        """
+        The rest of select_where for candidates rids, with the needed predicate
+        columns, the keys and the projected columns taken from the values the
+        covering index keeps. Only the schema word is read from the base row.
+        """
+        pos = {c: i for i, c in enumerate(index.include)}
+        payload = index.payload
+        rows = [(rid, payload[rid]) for rid in rids]
+        for col in needed:
+            lo, hi = ranges[col]
+            i = pos[col]
+            rows = [(rid, row) for rid, row in rows
+                    if (lo is None or row[i] >= lo) and (hi is None or row[i] <= hi)]
+        if not rows:
+            return []
+
+        key_pos = pos[self.key]
+        if not all(self.lock_many(txn_id, [row[key_pos] for _, row in rows], mode="S")):
+            return False  # lock conflict. transaction should abort
+        take = [pos[c] if sel else None for c, sel in enumerate(projected_columns)]
+        out = [Record(rid, row[key_pos], self._base.get(rid, SCHEMA_ENCODING_COLUMN),
+                      [row[i] if i is not None else None for i in take])
+               for rid, row in rows]
+        out.sort(key=lambda r: r.key)
+        return out
+
+    def _predicate_ranges(self, predicates):
+        """
+        Fold (column, op, value) predicates into column -> (lo, hi), inclusive
+        bounds with None for open ends. None if a predicate is invalid.
+        """
+        ranges = {}
+        for col, op, value in predicates:
+            if not (0 <= col < self.num_columns):
+                return None
+            if op == "==":
+                lo, hi = value, value
+            elif op == "<":
+                lo, hi = None, value - 1
+            elif op == "<=":
+                lo, hi = None, value
+            elif op == ">":
+                lo, hi = value + 1, None
+            elif op == ">=":
+                lo, hi = value, None
+            else:
+                return None
+            old_lo, old_hi = ranges.get(col, (None, None))
+            if old_lo is not None:
+                lo = old_lo if lo is None else max(lo, old_lo)
+            if old_hi is not None:
+                hi = old_hi if hi is None else min(hi, old_hi)
+            ranges[col] = (lo, hi)
+        return ranges
+
+    def _candidate_rids(self, ranges):
+        """
+        Base rids (in rid order) that can match ranges, and the set of columns
+        whose predicate they already satisfy. Uses the primary key if the key
+        column is constrained, else a secondary index (equality on any index
+        first, then ranges on ordered, then hash indexes), else every live record.
+        """
+        deleted = self._deleted
+        for col, (lo, hi) in ranges.items():
+            if lo is not None and hi is not None and lo > hi:
+                return [], set()
+        if self.key in ranges:
+            lo, hi = ranges[self.key]
+            if lo is not None and lo == hi:
+                rid = self._pk.get(lo)
+                return ([rid] if rid and not deleted[rid] else []), {self.key}
+            if self.index is not None:
+                rids = [rid for rid in self.index.locate_range(lo, hi, self.key) if not deleted[rid]]
+            else:
+                rids = [rid for k, rid in self._pk.items()
+                        if (lo is None or k >= lo) and (hi is None or k <= hi) and not deleted[rid]]
+            return sorted(rids), {self.key}
+        if self.index is not None:
+            composite = self._composite_candidates(ranges)
+            if composite is not None:
+                rids, cols = composite
+                return sorted(rid for rid in rids if not deleted[rid]), cols
+            indexed = [col for col in ranges if self.index.is_indexed(col)]
+            indexed.sort(key=lambda col: (ranges[col][0] is None or ranges[col][0] != ranges[col][1],
+                                          self.index.kind(col) != "ordered"))
+            if indexed:
+                col = indexed[0]
+                lo, hi = ranges[col]
+                rids = self.index.locate(col, lo) if lo == hi else self.index.locate_range(lo, hi, col)
+                return sorted(set(rid for rid in rids if not deleted[rid])), {col}
+        return [rid for rid in range(1, self._next_base_rid) if not deleted[rid]], set()
+
+    def _composite_candidates(self, ranges):
+        """
+        The composite index that covers the most predicate columns (equality on a
+        prefix of its columns, then optionally a range on the next), if it covers
+        at least two. Returns (rids, covered columns) or None.
+        """
+        best = None
+        for columns in self.index.composites:
+            prefix = []
+            for c in columns:
+                lo, hi = ranges.get(c, (None, None))
+                if lo is None or lo != hi:
+                    break
+                prefix.append(lo)
+            covered = columns[:len(prefix)]
+            bounds = (None, None)
+            if len(prefix) < len(columns) and columns[len(prefix)] in ranges:
+                bounds = ranges[columns[len(prefix)]]
+                covered = columns[:len(prefix) + 1]
+            if len(covered) >= 2 and (best is None or len(covered) > len(best[1])):
+                best = (columns, covered, prefix, bounds)
+        if best is None:
+            return None
+        columns, covered, prefix, (lo, hi) = best
+        return self.index.locate_prefix(columns, prefix, lo, hi), set(covered)
+
+    def select_many(self, search_keys, search_key_index: int, projected_columns, txn_id=None):
+        """
+        Multi-get on the PK column. Returns a list aligned with search_keys holding a
+        tuple of the projected values (only the columns marked 1, in column order) or
+        None for keys that do not exist. False if any S lock conflicts.
+        """
+        if search_key_index != self.key:
+            return []
+        pk = self._pk
+        deleted = self._deleted
+        kf = self._key_filter
+        found = []
+        for i, k in enumerate(search_keys):
+            if kf is not None and k not in kf:
+                continue
+            rid = pk.get(k)
+            if rid and not deleted[rid]:
+                found.append((rid, i))
+        if not all(self.lock_many(txn_id, [search_keys[i] for _, i in found], mode="S")):
+            return False  # lock conflict. transaction should abort
+
+        # visit records in rid order so reads follow the storage layout
+        found.sort()
+        cols = [c for c, sel in enumerate(projected_columns) if sel]
+        out = [None] * len(search_keys)
+        for rid, i in found:
+            vals = self._latest_view(rid)[0]
+            out[i] = tuple([vals[c] for c in cols])
+        return out
+
+    def select_version(self, search_key: int, search_key_index: int, projected_columns, relative_version: int, lazy=False):
         """
         Versioned select:
             0  -> latest
-           -1  -> base
-           -k  -> skip newest (k-1) tails
+           -1  -> oldest version kept
+           -k  -> skip newest (k-1) versions
         """
         if search_key_index != self.key:
             return []
         base_rid = self._pk.get(search_key)
-        if not base_rid or self._deleted.get(base_rid, False):
+        if not base_rid or self._deleted[base_rid]:
             return []
+        if lazy:
+            return [self._lazy_record(base_rid, search_key, relative_version, projected_columns)]
         vals, schema_mask = self._version_view(base_rid, relative_version)
         projected = [v if sel else None for v, sel in zip(vals, projected_columns)]
         return [Record(base_rid, search_key, schema_mask, projected)]
 
+    def select_as_of(self, search_key: int, search_key_index: int, projected_columns, as_of: int, txn_id=None):
+        """
+        Select the version of a record that was current at timestamp as_of (see
+        lstore.clock.now). Returns [] if the record did not exist at that time.
+        """
+        if search_key_index != self.key:
+            return []
+        base_rid = self._pk.get(search_key)
+        if not base_rid or self._deleted[base_rid]:
+            return []
+        if not self.lock(txn_id, search_key, mode="S"):
+            return False  # lock conflict. transaction should abort
+        start = self._as_of_start(base_rid, as_of)
+        if start is None:
+            return []
+        vals = self._values_at(base_rid, start)
+        projected = [v if sel else None for v, sel in zip(vals, projected_columns)]
+        return [Record(base_rid, search_key, self._base.get(base_rid, SCHEMA_ENCODING_COLUMN), projected)]
+
+    def scan(self, start_key: int, end_key: int, projected_columns, batch_size: int = 1024,
+             columnar: bool = False, txn_id=None):
+        """
+        Walk the live records with keys in [start_key, end_key] in key order.
+        Returns a generator (False on a lock conflict) that reads batch_size
+        records at a time and yields either one Record per record, or with
+        columnar=True one (keys, columns) pair per batch where columns[c] holds
+        the batch's values of column c (None for columns not projected).
+        Records are read batch by batch, so a batch sees updates made before it is
+        read. With an ordered key index and no transaction the keys are streamed
+        from the index too, batch_size at a time, so memory does not grow with the
+        range. Otherwise the sorted matching keys are collected up front (8 bytes
+        each): inside a transaction every one is S-locked before the first batch,
+        and without an ordered index the pk map gives no key order.
+        """
+        if batch_size < 1:
+            return False
+        deleted = self._deleted
+        ordered = self.index is not None and self.index.kind(self.key) == "ordered"
+        if ordered and txn_id is None:
+            return self._scan_batches(self._key_batches(start_key, end_key, batch_size),
+                                      projected_columns, columnar)
+        if ordered:
+            keys = array('q', (k for k, rids in self.index.indices[self.key].range(start_key, end_key)
+                               if not all(deleted[rid] for rid in rids)))
+        else:
+            keys = array('q', sorted(k for k, rid in self._pk.items()
+                                     if start_key <= k <= end_key and not deleted[rid]))
+        if txn_id is not None and not all(self.lock_many(txn_id, list(keys), mode="S")):
+            return False  # lock conflict. transaction should abort
+        batches = (keys[i:i + batch_size] for i in range(0, len(keys), batch_size))
+        return self._scan_batches(batches, projected_columns, columnar)
+
+    def _key_batches(self, start_key: int, end_key: int, batch_size: int):
+        """
+        Yield lists of up to batch_size live keys in [start_key, end_key], in order,
+        from the ordered key index. Each batch seeks the tree again from the last key
+        it returned, so writes between batches cannot make the walk skip or repeat keys.
+        """
+        tree = self.index.indices[self.key]
+        deleted = self._deleted
+        low, resumed = start_key, False
+        while True:
+            batch = []
+            for k, rids in tree.range(low, end_key):
+                if resumed and k == low:
+                    continue  # the last key of the previous batch
+                if not all(deleted[rid] for rid in rids):
+                    batch.append(k)
+                    if len(batch) == batch_size:
+                        break
+            else:
+                if batch:
+                    yield batch
+                return
+            yield batch
+            low, resumed = batch[-1], True
+
+    def _scan_batches(self, key_batches, projected_columns, columnar: bool):
+        pk = self._pk
+        deleted = self._deleted
+        for keys in key_batches:
+            batch = []
+            for k in keys:
+                rid = pk.get(k)
+                if rid and not deleted[rid]:  # skip records deleted since the scan started
+                    batch.append((k, rid))
+            if columnar:
+                rids = [rid for _, rid in batch]
+                yield ([k for k, _ in batch],
+                       [self._column_values(rids, c) if sel else None for c, sel in enumerate(projected_columns)])
+                continue
+            for k, rid in batch:
+                vals, schema_mask = self._latest_view(rid)
+                yield Record(rid, k, schema_mask, [v if sel else None for v, sel in zip(vals, projected_columns)])
+
+    def _lazy_record(self, base_rid: int, key_val: int, relative_version: int, projected_columns):
+        return LazyRecord(self, base_rid, key_val, self._base.get(base_rid, SCHEMA_ENCODING_COLUMN),
+                          self._version_start(base_rid, relative_version), projected_columns)
+
     def update(self, search_key: int, *columns, txn_id = None) -> bool:
         """
         Update row by PK; pass None to skip a column.
@@ -279,7 +886,7 @@ class Table:
             return False
         
         base_rid = self._pk.get(search_key)
-        if not base_rid or self._deleted.get(base_rid, False):
+        if not base_rid or self._deleted[base_rid]:
             return False
 
         current_vals, _ = self._latest_view(base_rid)
@@ -292,64 +899,427 @@ class Table:
         if schema == 0:
             return True  # nothing to change
 
-        tail_rid = self._next_tail_rid
-        self._next_tail_rid += 1
+        self._append_tail(base_rid, search_key, schema, new_vals, self._now())
+        return True
 
-        prev_head = self._rows[base_rid][INDIRECTION_COLUMN]
-        tail_row = self._compose_row(prev_head, tail_rid, self._now(), schema, new_vals)
-        self._rows[tail_rid] = tail_row
+    def update_many(self, updates, txn_id=None, collapse=True):
+        """
+        Batch update. updates is a list of (key, columns) pairs, None skips a column.
+        Returns one True/False per pair. Keys are X-locked in one call, each record's
+        latest view is read once and the batch shares one timestamp.
+        With collapse=True every update to the same key in the batch lands in a single
+        tail record (the in-between states are never visible as separate versions);
+        collapse=False keeps one tail per update like calling update in a loop.
+        """
+        n = self.num_columns
+        status = [False] * len(updates)
+        groups = {}  # key -> indexes into updates, in batch order
+        for i, (key, columns) in enumerate(updates):
+            if len(columns) == n:
+                groups.setdefault(key, []).append(i)
+        granted = self.lock_many(txn_id, list(groups), mode="X")
 
-        # patch base row
-        base_row = self._rows[base_rid]
-        base_row[INDIRECTION_COLUMN] = tail_rid
-        base_row[SCHEMA_ENCODING_COLUMN] |= schema
-        base_row[TIMESTAMP_COLUMN] = self._now()
-        self._head[base_rid] = tail_rid
+        now = self._now()
+        for (key, idxs), ok in zip(groups.items(), granted):
+            if not ok:
+                continue  # lock conflict
+            base_rid = self._pk.get(key)
+            if not base_rid or self._deleted[base_rid]:
+                continue
+            new_vals = self._latest_view(base_rid)[0]
+            schema = 0
+            for i in idxs:
+                step = 0
+                for c, v in enumerate(updates[i][1]):
+                    if v is not None:
+                        new_vals[c] = v
+                        step |= (1 << c)
+                status[i] = True
+                if not collapse and step:
+                    self._append_tail(base_rid, key, step, new_vals[:], now)
+                schema |= step
+            if collapse and schema:
+                self._append_tail(base_rid, key, schema, new_vals, now)
+        return status
 
+    def apply(self, search_key: int, fns, txn_id=None) -> bool:
+        """
+        Read-modify-write in one step: fns has one entry per column, either None
+        (leave as is) or a function old_value -> new_value. The current row is read
+        once and the new tail appended under a single X lock.
+        """
+        if self.lock(txn_id, search_key, mode="X") == False:
+            return False  # lock conflict. transaction should abort
+        if len(fns) != self.num_columns:
+            return False
+        base_rid = self._pk.get(search_key)
+        if not base_rid or self._deleted[base_rid]:
+            return False
+
+        new_vals = self._latest_view(base_rid)[0]
+        schema = 0
+        for i, fn in enumerate(fns):
+            if fn is not None:
+                new_vals[i] = fn(new_vals[i])
+                schema |= (1 << i)
+        if schema:
+            self._append_tail(base_rid, search_key, schema, new_vals, self._now())
         return True
 
+    def increment(self, search_key: int, column: int, delta: int = 1, txn_id=None) -> bool:
+        """
+        Atomically add delta to one column of the record with key search_key.
+        """
+        if not (0 <= column < self.num_columns):
+            return False
+        fns = [None] * self.num_columns
+        fns[column] = lambda v: v + delta
+        return self.apply(search_key, fns, txn_id=txn_id)
+
+    def _append_tail(self, base_rid: int, key_val: int, schema: int, new_vals, now: int):
+        """
+        Write a tail record for the columns in schema (taken from new_vals, the
+        full row after the update) and make it the newest version of base_rid.
+        """
+        with self._latch:
+            tail_rid = self._next_tail_rid
+            self._next_tail_rid += 1
+
+            base = self._base
+            prev_head = base.get(base_rid, INDIRECTION_COLUMN)
+            # timestamps never go backwards along a chain (now may be taken before the latch)
+            if prev_head:
+                now = max(now, self._tail.get(prev_head & OFFSET_MASK, TIMESTAMP_COLUMN))
+            # move the record in every secondary index on a column this update sets,
+            # and refresh what covering indexes keep of it
+            if self.index is not None:
+                for columns, index in self.index.all_indexes():
+                    cols = columns if isinstance(columns, tuple) else (columns,)
+                    moved = False
+                    if any((schema >> c) & 1 for c in cols):
+                        old = self._index_value(columns, lambda c: self._value_at(base_rid, prev_head, c))
+                        new = self._index_value(columns, new_vals.__getitem__)
+                        if old != new:
+                            self.index.remove(columns, old, base_rid)
+                            index.insert(new, base_rid)
+                            moved = True
+                    if index.include and (moved or any((schema >> c) & 1 for c in index.include)):
+                        index.cover(base_rid, tuple([new_vals[c] for c in index.include]))
+            self._write_tail(tail_rid, prev_head, now, schema, new_vals)
+
+            # patch base row. Its timestamp stays the time the base values were written
+            base.set(base_rid, INDIRECTION_COLUMN, tail_rid)
+            base.set(base_rid, SCHEMA_ENCODING_COLUMN, base.get(base_rid, SCHEMA_ENCODING_COLUMN) | schema)
+            times = self._ts_index.get(base_rid)
+            if times is not None:
+                times[0].append(now)
+                times[1].append(tail_rid)
+
+            for col, agg in self._aggregates.items():
+                if (schema >> col) & 1:
+                    agg.set(key_val, new_vals[col])
+
     def delete(self, search_key: int, txn_id = None) -> bool:
         """
         Logical delete by PK (ignored by selects/sums).
+        Outside a transaction the record is freed right away; inside one it is
+        queued and freed by reclaim() (or merge) once the transaction is over.
         """
         # get exclusive (X) lock for write operation
         if self.lock(txn_id, search_key, mode="X") == False:
             return False  # lock conflict, transaction should abort
         
         base_rid = self._pk.get(search_key)
-        if not base_rid or self._deleted.get(base_rid, False):
+        if not base_rid or self._deleted[base_rid]:
             return False
            
-        self._deleted[base_rid] = True
-        self._index_remove_pk(search_key, base_rid)
-
+        # indexes and maintained sums are shared with concurrent writers of other keys
+        with self._latch:
+            self._index_remove(base_rid)
+            self._deleted[base_rid] = 1
+            for agg in self._aggregates.values():
+                agg.remove(search_key)
+            if txn_id is None:
+                self._free_record(search_key, base_rid)
+            else:
+                self._pending_reclaim.append((search_key, base_rid))
         return True
 
+    def reclaim(self, limit=None) -> int:
+        """
+        Physically free deleted records: drop the pk entry, unlink the tail chain
+        and put the base slot on the free list for insert to reuse. A record is only
+        freed once no transaction holds a lock on its key (the deleting transaction
+        has committed or aborted); the rest stay queued. limit caps the work per call
+        so this can run incrementally. The unlinked tails are dropped by the next merge.
+        Returns the number of records freed.
+        """
+        with self._latch:
+            pending = self._pending_reclaim
+            kept = []
+            freed = 0
+            for i, (key_val, base_rid) in enumerate(pending):
+                if limit is not None and freed >= limit:
+                    kept.extend(pending[i:])
+                    break
+                if self.lock_manager is not None and self.lock_manager.is_locked(key_val):
+                    kept.append((key_val, base_rid))
+                    continue
+                self._free_record(key_val, base_rid)
+                freed += 1
+            self._pending_reclaim = kept
+        return freed
+
+    def _free_record(self, key_val: int, base_rid: int):
+        # caller holds self._latch. The deleted flag stays set until the slot is reused.
+        if self._pk.get(key_val) == base_rid:
+            del self._pk[key_val]
+            kf = self._key_filter
+            if kf is not None:
+                kf.remove(key_val)
+                if kf.needs_rebuild():
+                    self._build_key_filter(kf.error_rate)
+        for agg in self._aggregates.values():
+            agg.discard(key_val)
+        self._ts_index.pop(base_rid, None)
+        self._history_dir.pop(base_rid, None)
+        self._base.put(base_rid, [0] * self._base.width)
+        self._generations[base_rid] = self._generations.get(base_rid, 0) + 1
+        self._free_base.append(base_rid)
+
+    def _range_rids(self, start_key: int, end_key: int):
+        """
+        Base rids of the live records whose key is in [start_key, end_key].
+        """
+        deleted = self._deleted
+        if self.index is not None and self.index.indices[self.key] is not None:
+            # ordered key index: only the keys in range are visited
+            return [rid for rid in self.index.locate_range(start_key, end_key, self.key) if not deleted[rid]]
+        return [rid for k, rid in self._pk.items()
+                if start_key <= k <= end_key and not deleted[rid]]
+
+    def _column_values(self, rids, column_index: int, relative_version: int = 0, as_of: int = None):
+        """
+        Values of one user column for the given base rids at a version (or at
+        timestamp as_of, then every rid must already exist at as_of).
+        With numpy this is a contiguous int64 array: the base column overlaid
+        with the values from each record's snapshot tail. Otherwise a list.
+        """
+        bit = 1 << column_index
+        base = self._base
+        if as_of is None:
+            start_of = lambda rid: self._version_start(rid, relative_version)
+        else:
+            start_of = lambda rid: self._as_of_start(rid, as_of)
+        if np is None:
+            return [self._value_at(rid, start_of(rid), column_index)
+                    if base.get(rid, SCHEMA_ENCODING_COLUMN) & bit else base.get(rid, META_COLS + column_index)
+                    for rid in rids]
+
+        offsets = np.array(rids, dtype=np.int64)
+        values = base.gather(META_COLS + column_index, offsets)
+        # only records with a tail chain or kept history that ever touched this
+        # column need a walk (older versions only for history)
+        schemas = base.gather(SCHEMA_ENCODING_COLUMN, offsets)
+        if relative_version == -1 and as_of is None:
+            walk = np.zeros(len(rids), dtype=bool)
+        else:
+            walk = base.gather(INDIRECTION_COLUMN, offsets) != 0
+        hist = self._history_dir
+        if hist and (relative_version != 0 or as_of is not None):
+            walk |= np.fromiter((rid in hist for rid in rids), dtype=bool, count=len(rids))
+        updated = np.flatnonzero(walk & ((schemas & bit) != 0)).tolist()
+        if updated:
+            values[updated] = np.fromiter(
+                (self._value_at(rids[i], start_of(rids[i]), column_index) for i in updated),
+                dtype=np.int64, count=len(updated))
+        return values
+
+    def _range_values(self, start_key: int, end_key: int, column_index: int, relative_version: int = 0):
+        """
+        Column values of every live record in [start_key, end_key] at a version,
+        or None for a bad column. Shared scan path of all range aggregates.
+        Latest values of a column a covering index includes come from the index.
+        """
+        if not (0 <= column_index < self.num_columns):
+            return None
+        rids = self._range_rids(start_key, end_key)
+        covering = None
+        if relative_version == 0 and self.index is not None:
+            covering = self.index.covering([column_index])
+        if covering is not None:
+            payload = covering.payload
+            i = covering.include.index(column_index)
+            values = [payload[rid][i] for rid in rids]
+            return np.array(values, dtype=np.int64) if np is not None else values
+        return self._column_values(rids, column_index, relative_version)
+
     def sum(self, start_key: int, end_key: int, column_index: int) -> int:
         """
         Sum the latest values of column_index for keys in [start_key, end_key].
         """
-        if not (0 <= column_index < self.num_columns):
-            return 0
-        total = 0
-        for k, rid in self._pk.items():
-            if start_key <= k <= end_key and not self._deleted.get(rid, False):
-                vals, _ = self._latest_view(rid)
-                total += vals[column_index]
-        return total
+        agg = self._aggregates.get(column_index)
+        if agg is not None:
+            return agg.range_sum(start_key, end_key)
+        return self.sum_version(start_key, end_key, column_index, 0)
 
     def sum_version(self, start_key: int, end_key: int, column_index: int, relative_version: int) -> int:
         """
-        Versioned sum computed via select_version snapshots.
+        Versioned sum over the snapshot each record had at relative_version.
+        """
+        values = self._range_values(start_key, end_key, column_index, relative_version)
+        if values is None:
+            return 0
+        return int(values.sum()) if np is not None else sum(values)
+
+    def sum_as_of(self, start_key: int, end_key: int, column_index: int, as_of: int) -> int:
+        """
+        Sum of column_index over the records in [start_key, end_key] as they were
+        at timestamp as_of. Records created after as_of are left out.
         """
         if not (0 <= column_index < self.num_columns):
             return 0
-        total = 0
+        base = self._base
+        hist = self._history_dir
+        rids = [rid for rid in self._range_rids(start_key, end_key)
+                if base.get(rid, TIMESTAMP_COLUMN) <= as_of
+                or (rid in hist and self._as_of_start(rid, as_of) is not None)]
+        values = self._column_values(rids, column_index, as_of=as_of)
+        return int(values.sum()) if np is not None else sum(values)
+
+    def count(self, start_key: int, end_key: int) -> int:
+        """
+        Number of live records with keys in [start_key, end_key]. Versions do not
+        change which records exist, so there is no versioned variant.
+        """
+        return len(self._range_rids(start_key, end_key))
+
+    def min(self, start_key: int, end_key: int, column_index: int):
+        return self.min_version(start_key, end_key, column_index, 0)
+
+    def min_version(self, start_key: int, end_key: int, column_index: int, relative_version: int):
+        """
+        Smallest value of column_index in the range, False if the range is empty.
+        """
+        values = self._range_values(start_key, end_key, column_index, relative_version)
+        if values is None or len(values) == 0:
+            return False
+        return int(values.min()) if np is not None else min(values)
+
+    def max(self, start_key: int, end_key: int, column_index: int):
+        return self.max_version(start_key, end_key, column_index, 0)
+
+    def max_version(self, start_key: int, end_key: int, column_index: int, relative_version: int):
+        """
+        Largest value of column_index in the range, False if the range is empty.
+        """
+        values = self._range_values(start_key, end_key, column_index, relative_version)
+        if values is None or len(values) == 0:
+            return False
+        return int(values.max()) if np is not None else max(values)
+
+    def avg(self, start_key: int, end_key: int, column_index: int):
+        return self.avg_version(start_key, end_key, column_index, 0)
+
+    def avg_version(self, start_key: int, end_key: int, column_index: int, relative_version: int):
+        """
+        Mean of column_index over the range as a float, False if the range is empty.
+        """
+        values = self._range_values(start_key, end_key, column_index, relative_version)
+        if values is None or len(values) == 0:
+            return False
+        return float(values.mean()) if np is not None else sum(values) / len(values)
+
+    def create_aggregate(self, column_index: int) -> bool:
+        """
+        Start maintaining a range-sum index on column_index, bulk built from the
+        current latest values. Table.sum on that column then answers in O(log n).
+        """
+        if not (0 <= column_index < self.num_columns):
+            return False
+        pairs = []
         for k, rid in self._pk.items():
-            if start_key <= k <= end_key and not self._deleted.get(rid, False):
-                vals, _schema = self._version_view(rid, relative_version)
-                total += vals[column_index]
-        return total
+            if not self._deleted[rid]:
+                pairs.append((k, self._latest_value(rid, column_index)))
+        agg = SumIndex()
+        agg.build(pairs)
+        self._aggregates[column_index] = agg
+        return True
+
+    def drop_aggregate(self, column_index: int):
+        self._aggregates.pop(column_index, None)
+
+    def create_key_filter(self, error_rate: float = 0.01) -> bool:
+        """
+        Start keeping a Bloom filter over the primary keys, so select, select_many
+        and the duplicate check of insert stop at the filter for most absent keys.
+        Sized for twice the current keys, rebuilt when it fills up or when half of
+        it is keys freed by delete/reclaim.
+        """
+        if not 0 < error_rate < 1:
+            return False
+        with self._latch:
+            self._build_key_filter(error_rate)
+        return True
+
+    def drop_key_filter(self):
+        self._key_filter = None
+
+    def _build_key_filter(self, error_rate: float):
+        # caller holds self._latch
+        kf = BloomFilter(max(1024, 2 * len(self._pk)), error_rate)
+        kf.update(self._pk)
+        self._key_filter = kf
+
+    def _key_filter_add(self, key_val: int):
+        # caller holds self._latch, key_val was just added to _pk
+        kf = self._key_filter
+        if kf is not None:
+            kf.add(key_val)
+            if kf.needs_rebuild():
+                self._build_key_filter(kf.error_rate)
+
+    def _save_key_filter(self, bufferpool):
+        """
+        Write the key filter's bits to bufferpool pages (flushed with the other
+        pages on close). Returns its settings for the table file, None if there
+        is no filter.
+        """
+        kf = self._key_filter
+        if kf is None:
+            return None
+        for page_idx, start in enumerate(range(0, len(kf.bits), PAGE_BYTES)):
+            chunk = kf.bits[start:start + PAGE_BYTES]
+            page = bufferpool.get_page(self.name, 0, "key_filter", page_idx, 0)
+            page.data[:len(chunk)] = chunk
+            bufferpool.release_page(self.name, 0, "key_filter", page_idx, 0, modified=True)
+        return {"capacity": kf.capacity, "error_rate": kf.error_rate, "count": kf.count, "stale": kf.stale}
+
+    def _load_key_filter(self, bufferpool, saved):
+        """Restore a key filter written by _save_key_filter (call after _pk is restored)."""
+        kf = BloomFilter(int(saved["capacity"]), float(saved["error_rate"]))
+        for page_idx, start in enumerate(range(0, len(kf.bits), PAGE_BYTES)):
+            page = bufferpool.get_page(self.name, 0, "key_filter", page_idx, 0)
+            n = min(PAGE_BYTES, len(kf.bits) - start)
+            kf.bits[start:start + n] = page.data[:n]
+            bufferpool.release_page(self.name, 0, "key_filter", page_idx, 0)
+        kf.count, kf.stale = int(saved["count"]), int(saved["stale"])
+        self._key_filter = kf
+        if len(self._pk) > kf.count - kf.stale or (self._pk and not any(kf.bits)):
+            # pages missing or older than the keys: a stale filter could hide keys
+            self._build_key_filter(kf.error_rate)
+
+    def set_retention(self, versions=None, seconds=None) -> bool:
+        """
+        Set how much history merge keeps per record besides the latest version:
+        at most `versions` older versions, and only versions that were still
+        current within the last `seconds`. None means no limit on that axis.
+        """
+        if (versions is not None and versions < 0) or (seconds is not None and seconds < 0):
+            return False
+        self.retain_versions = versions
+        self.retain_seconds = seconds
+        return True
 
     def _merge(self):
         """
@@ -361,31 +1331,169 @@ class Table:
         """
         Materialize the latest view of each base record, reset indirection,
         and discard its tail chain. This prevents unbounded tail growth.
+        The versions the chain held (and the old base row) move into the history
+        store as full rows, minus whatever is past the retention horizon.
+        Deleted records are reclaimed first; the tail store is rebuilt with only
+        the chains that are kept (deleted records whose transaction still runs).
         """
-        tails_to_remove = []
-        now = self._now()
+        self.reclaim()
+        self._merge_epoch += 1
+        base = self._base
+        kept = []
+        history = ColumnStore(self._history.width)
+        history_dir = {}
+        horizon = None if self.retain_seconds is None else self._now() - int(self.retain_seconds * 1_000_000)
 
-        for base_rid, row in list(self._rows.items()):
-            # Skip tail rows and logically deleted rows
-            if base_rid >= 1_000_000_000 or self._deleted.get(base_rid, False):
+        for base_rid in range(1, self._next_base_rid):
+            head = base.get(base_rid, INDIRECTION_COLUMN)
+            old = self._history_rows(base_rid)
+            if self._deleted[base_rid]:
+                if head:
+                    kept.append(base_rid)
+                if old:
+                    self._put_history(history, history_dir, base_rid, old)
                 continue
-
-            head = row[INDIRECTION_COLUMN]
             if head == 0:
-                continue  # nothing to merge for this record
+                # nothing new to merge, the horizon may still have moved past old versions
+                old = self._retained(old, base.get(base_rid, TIMESTAMP_COLUMN), horizon)
+                if old:
+                    self._put_history(history, history_dir, base_rid, old)
+                continue
 
-            latest_vals, latest_schema = self._latest_view(base_rid)
-            # Rewrite base row with consolidated values
-            self._rows[base_rid] = self._compose_row(0, base_rid, now, latest_schema, latest_vals)
-            self._head[base_rid] = 0
+            # every version oldest first: kept history, the base row, then each tail
+            versions = old
+            vals = base.row(base_rid, META_COLS)
+            versions.append([base.get(base_rid, TIMESTAMP_COLUMN)] + vals)
+            for row in reversed(self._chain_rows(head)):
+                vals = vals[:]
+                for c in range(self.num_columns):
+                    if (row[SCHEMA_ENCODING_COLUMN] >> c) & 1:
+                        vals[c] = row[META_COLS + c]
+                versions.append([row[TIMESTAMP_COLUMN]] + vals)
 
-            # Collect the tail chain to prune
-            cur = head
-            while cur:
-                tails_to_remove.append(cur)
-                tail_row = self._rows.get(cur)
-                cur = tail_row[INDIRECTION_COLUMN] if tail_row else 0
+            latest = versions.pop()
+            versions = self._retained(versions, latest[0], horizon)
+            if versions:
+                self._put_history(history, history_dir, base_rid, versions)
+            # Rewrite base row with consolidated values, stamped with the time they were written
+            base.put(base_rid, self._compose_row(0, base_rid, latest[0],
+                                                 base.get(base_rid, SCHEMA_ENCODING_COLUMN), latest[1:]))
+        self._history = history
+        self._history_dir = history_dir
+
+        # Drop old tail records: copy surviving chains into a fresh tail store
+        chains = [(base_rid, self._chain_rows(base.get(base_rid, INDIRECTION_COLUMN))) for base_rid in kept]
+        self._tail = ColumnStore(self._tail.width)
+        self._tail_values = ColumnStore(1)
+        self._ts_index = {}
+        self._next_tail_rid = TAIL_RID_START
+        for base_rid, chain in chains:
+            prev = 0
+            for row in reversed(chain):
+                new_rid = self._next_tail_rid
+                self._next_tail_rid += 1
+                self._write_tail(new_rid, prev, row[TIMESTAMP_COLUMN], row[SCHEMA_ENCODING_COLUMN], row[META_COLS:])
+                prev = new_rid
+            base.set(base_rid, INDIRECTION_COLUMN, prev)
+
+    def _retained(self, versions, newer_ts: int, horizon):
+        """
+        The old versions (oldest first, [ts, *values]) that fall inside the
+        retention horizon. newer_ts is when the version after the last one was
+        written; a version is past the age horizon once it was replaced before it.
+        """
+        if horizon is not None:
+            ends = [v[0] for v in versions[1:]] + [newer_ts]
+            versions = [v for v, end in zip(versions, ends) if end >= horizon]
+        if self.retain_versions is not None:
+            versions = versions[max(0, len(versions) - self.retain_versions):] if self.retain_versions else []
+        return versions
+
+    def _history_rows(self, base_rid: int):
+        """
+        Kept history of base_rid as a list of [ts, *values], oldest first.
+        """
+        hist = self._history_dir.get(base_rid)
+        if not hist:
+            return []
+        first, count = hist
+        return [self._history.row(off) for off in range(first, first + count)]
+
+    def _put_history(self, history, history_dir, base_rid: int, rows):
+        history_dir[base_rid] = (len(history), len(rows))
+        for row in rows:
+            history.append(row)
+
+    def _chain_rows(self, head: int):
+        """
+        Full-width rows of a tail chain, newest first.
+        """
+        chain = []
+        cur = head
+        while cur:
+            chain.append(self._tail_row(cur))
+            cur = chain[-1][INDIRECTION_COLUMN]
+        return chain
 
-        # Drop old tail records
-        for tr in tails_to_remove:
-            self._rows.pop(tr, None)
+    def _write_tail(self, tail_rid: int, indirection: int, ts: int, schema: int, values):
+        """
+        Store a tail record. values is a full-width row, only the columns set in
+        schema are kept (appended to the value heap).
+        """
+        heap = self._tail_values
+        pos = len(heap)
+        for c, v in enumerate(values):
+            if (schema >> c) & 1:
+                heap.append((v,))
+        self._tail.put(tail_rid & OFFSET_MASK, (indirection, tail_rid, ts, schema, pos))
+
+    def _tail_row(self, tail_rid: int):
+        """
+        A tail record expanded to full width (0 for columns it does not set).
+        """
+        off = tail_rid & OFFSET_MASK
+        indirection, rid, ts, schema, pos = self._tail.row(off)
+        values = [0] * self.num_columns
+        for c in range(self.num_columns):
+            if (schema >> c) & 1:
+                values[c] = self._tail_values.get(pos, 0)
+                pos += 1
+        return [indirection, rid, ts, schema] + values
+
+    # persistence helpers (used by Database.open/close)
+    def _iter_rows(self):
+        """
+        Yield (rid, row) for every stored base and tail record, tails expanded to full width.
+        """
+        free = set(self._free_base)
+        for rid in range(1, self._next_base_rid):
+            if rid not in free:
+                yield rid, self._base.row(rid)
+        for off in range(len(self._tail)):
+            yield TAIL_RID_START + off, self._tail_row(TAIL_RID_START + off)
+
+    def _iter_history(self):
+        """
+        Yield (base rid, [[ts, *values], ...]) for every record with kept history.
+        """
+        for base_rid in self._history_dir:
+            yield base_rid, self._history_rows(base_rid)
+
+    def _restore_history(self, base_rid: int, rows):
+        self._put_history(self._history, self._history_dir, base_rid, rows)
+
+    def _restore_row(self, rid: int, row):
+        if rid & TAIL_SEGMENT:
+            self._write_tail(rid, row[INDIRECTION_COLUMN], row[TIMESTAMP_COLUMN],
+                             row[SCHEMA_ENCODING_COLUMN], row[META_COLS:])
+        else:
+            self._base.put(rid, row)
+
+    def memory_usage(self) -> int:
+        """
+        Approximate bytes held by record storage: the column pages, deleted
+        flags and the pk -> rid map (entries plus their int objects).
+        """
+        pk_bytes = getsizeof(self._pk) + sum(getsizeof(k) + getsizeof(r) for k, r in self._pk.items())
+        return (self._base.nbytes() + self._tail.nbytes() + self._tail_values.nbytes()
+                + self._history.nbytes() + pk_bytes)
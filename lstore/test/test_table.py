@@ -79,10 +79,967 @@ def test_edges():
 
     print("All edge tests passed!")
 
+def test_sum_paths():
+    print("Running sum path tests...")
+    import lstore.table as table_module
+    db = Database()
+    t = db.create_table("Sums", 3, 0)
+    q = Query(t)
+    for k in range(1, 51):
+        assert q.insert(k, k * 10, 1)
+    for k in range(1, 51, 3):
+        assert q.update(k, None, k * 100, None)
+        assert q.update(k, None, None, 7)
+
+    expected_latest = sum(k * 100 if k % 3 == 1 else k * 10 for k in range(5, 41))
+    expected_base = sum(k * 10 for k in range(5, 41))
+    expected_minus2 = sum(k * 100 if k % 3 == 1 else k * 10 for k in range(5, 41))
+
+    # same answers with and without numpy
+    saved = table_module.np
+    try:
+        for np_module in (saved, None):
+            table_module.np = np_module
+            assert q.sum(5, 40, 1) == expected_latest
+            assert q.sum_version(5, 40, 1, -1) == expected_base
+            assert q.sum_version(5, 40, 1, -2) == expected_minus2
+            assert q.sum_version(5, 40, 2, -2) == 36
+            assert q.sum(100, 200, 1) == 0
+    finally:
+        table_module.np = saved
+
+    print("All sum path tests passed!")
+
+def test_aggregate_index():
+    print("Running aggregate index tests...")
+    import tempfile
+    from random import Random
+    rng = Random(7)
+    path = tempfile.mkdtemp()
+    db = Database()
+    db.open(path)
+    t = db.create_table("Agg", 3, 0)
+    q = Query(t)
+    keys = list(range(0, 400, 2))
+    for k in keys[:100]:                  # ascending inserts
+        assert q.insert(k, k, 1)
+    assert t.create_aggregate(1)
+    for k in reversed(keys[100:]):        # out of order inserts
+        assert q.insert(k, k, 1)
+    for k in rng.sample(keys, 80):
+        assert q.update(k, None, rng.randint(-50, 50), None)
+    for k in rng.sample(keys, 30):
+        q.delete(k)
+
+    def scan_sum(lo, hi):
+        t._aggregates.pop(1)
+        try:
+            return q.sum(lo, hi, 1)
+        finally:
+            t._aggregates[1] = agg
+
+    agg = t._aggregates[1]
+    for _ in range(50):
+        lo, hi = sorted(rng.sample(range(-10, 410), 2))
+        assert q.sum(lo, hi, 1) == scan_sum(lo, hi)
+
+    # maintained aggregates are rebuilt on load
+    expected = q.sum(0, 400, 1)
+    db.close()
+    db2 = Database()
+    db2.open(path)
+    t2 = db2.get_table("Agg")
+    assert 1 in t2._aggregates
+    assert Query(t2).sum(0, 400, 1) == expected
+
+    print("All aggregate index tests passed!")
+
+def test_range_aggregates():
+    print("Running range aggregate tests...")
+    db = Database()
+    t = db.create_table("Aggs", 3, 0)
+    q = Query(t)
+    for k in range(10):
+        assert q.insert(k, k * 2, 5)
+    assert q.update(3, None, 100, None)
+    assert q.delete(4)
+
+    assert q.count(2, 6) == 4
+    assert q.min(2, 6, 1) == 4
+    assert q.max(2, 6, 1) == 100
+    assert q.avg(2, 6, 1) == (4 + 100 + 10 + 12) / 4
+    assert q.max_version(2, 6, 1, -1) == 12
+    assert q.avg_version(2, 6, 1, -1) == (4 + 6 + 10 + 12) / 4
+    assert q.min(50, 60, 1) is False
+    assert q.count(50, 60) == 0
+
+    print("All range aggregate tests passed!")
+
+def test_insert_many():
+    print("Running batch insert tests...")
+    from lstore.lock_manager import LockManager
+    db = Database()
+    t = db.create_table("Batch", 3, 0)
+    t.lock_manager = LockManager()
+    q = Query(t)
+    assert q.insert(5, 0, 0)
+    assert t.lock_manager.acquire_x(99, 7)      # someone else holds key 7
+
+    rows = [[1, 10, 11], [2, 20, 21], [1, 30, 31], [5, 1, 1], [3, None, 3], [4, 4], [7, 7, 7], [6, 60, 61]]
+    status = q.insert_many(rows, txn_id=1)
+    assert status == [True, True, False, False, False, False, False, True]
+    assert q.select(1, 0, [1, 1, 1])[0].columns == [1, 10, 11]
+    assert q.select(6, 0, [1, 1, 1])[0].columns == [6, 60, 61]
+    assert q.select(7, 0, [1, 1, 1]) == []
+    assert q.sum(0, 10, 1) == 10 + 20 + 60
+
+    print("All batch insert tests passed!")
+
+def test_select_many():
+    print("Running multi-get tests...")
+    from lstore.lock_manager import LockManager
+    db = Database()
+    t = db.create_table("MultiGet", 3, 0)
+    q = Query(t)
+    for k in range(20):
+        assert q.insert(k, k * 2, k * 3)
+    assert q.update(4, None, 400, None)
+    assert q.delete(6)
+
+    got = q.select_many([9, 4, 6, 100, 0], 0, [1, 0, 1])
+    assert got == [(9, 27), (4, 12), None, None, (0, 0)]
+    assert q.select_many([4], 0, [0, 1, 0]) == [(400,)]
+    assert q.select_many([4], 1, [1, 1, 1]) == []
+
+    t.lock_manager = LockManager()
+    assert t.lock_manager.acquire_x(99, 3)
+    assert q.select_many([1, 3], 0, [1, 1, 1], txn_id=1) is False
+    assert q.select_many([1, 2], 0, [1, 1, 1], txn_id=1) == [(1, 2, 3), (2, 4, 6)]
+
+    print("All multi-get tests passed!")
+
+def test_update_many():
+    print("Running batch update tests...")
+    db = Database()
+    t = db.create_table("BatchUpdate", 3, 0)
+    q = Query(t)
+    for k in range(5):
+        assert q.insert(k, 0, 0)
+    t.create_aggregate(1)
+
+    status = q.update_many([(1, [None, 5, None]), (2, [None, 7, 8]), (1, [None, None, 6]),
+                            (9, [None, 1, 1]), (3, [None, 1])])
+    assert status == [True, True, True, False, False]
+    assert q.select(1, 0, [1, 1, 1])[0].columns == [1, 5, 6]
+    assert q.select(2, 0, [1, 1, 1])[0].columns == [2, 7, 8]
+    # collapsed: both updates to key 1 are one version
+    assert q.select_version(1, 0, [1, 1, 1], -2)[0].columns == [1, 0, 0]
+    assert q.sum(0, 4, 1) == 12
+
+    assert q.update_many([(4, [None, 1, None]), (4, [None, None, 2])], collapse=False) == [True, True]
+    assert q.select_version(4, 0, [1, 1, 1], -2)[0].columns == [4, 1, 0]
+    assert q.select(4, 0, [1, 1, 1])[0].columns == [4, 1, 2]
+
+    print("All batch update tests passed!")
+
+def test_increment():
+    print("Running increment tests...")
+    from lstore.lock_manager import LockManager
+    db = Database()
+    t = db.create_table("Counters", 3, 0)
+    t.lock_manager = LockManager()
+    q = Query(t)
+    assert q.insert(1, 10, 20)
+    assert q.increment(1, 1)
+    assert q.increment(1, 1, txn_id=5)
+    assert q.select(1, 0, [1, 1, 1])[0].columns == [1, 12, 20]
+    assert q.apply(1, [None, lambda v: v * 2, lambda v: v - 1])
+    assert q.select(1, 0, [1, 1, 1])[0].columns == [1, 24, 19]
+
+    # increment now takes the X lock, txn 5 still holds it
+    assert q.increment(1, 2, txn_id=6) is False
+    assert q.increment(2, 1) is False
+    assert q.increment(1, 7) is False
+
+    print("All increment tests passed!")
+
+def test_column_storage():
+    print("Running column storage tests...")
+    import tempfile
+    from lstore.storage import PAGE_SLOTS
+    path = tempfile.mkdtemp()
+    db = Database()
+    db.open(path)
+    t = db.create_table("Pages", 3, 0)
+    q = Query(t)
+    n = PAGE_SLOTS * 2 + 10          # spans several pages
+    for k in range(n):
+        assert q.insert(k, k, -k)
+    for k in range(0, n, 7):
+        assert q.update(k, None, None, k * 10)
+    assert q.delete(14)
+    assert q.select(PAGE_SLOTS + 3, 0, [1, 1, 1])[0].columns == [PAGE_SLOTS + 3, PAGE_SLOTS + 3, -(PAGE_SLOTS + 3)]
+    assert q.select(7 * 80, 0, [1, 1, 1])[0].columns == [560, 560, 5600]
+    assert t.memory_usage() > 0
+
+    db.close()   # merges, then persists
+    db2 = Database()
+    db2.open(path)
+    q2 = Query(db2.get_table("Pages"))
+    assert q2.select(7 * 80, 0, [1, 1, 1])[0].columns == [560, 560, 5600]
+    assert q2.select(14, 0, [1, 1, 1]) == []
+    assert q2.sum(0, n, 1) == sum(range(n)) - 14
+    assert q2.update(21, None, 1, None)
+    assert q2.select(21, 0, [1, 1, 1])[0].columns == [21, 1, 210]
+
+    print("All column storage tests passed!")
+
+def test_delta_tails():
+    print("Running delta tail tests...")
+    from random import Random
+    import lstore.table as table_module
+    rng = Random(11)
+    db = Database()
+    t = db.create_table("Delta", 4, 0)
+    q = Query(t)
+    history = {}
+    for k in range(30):
+        row = [k, rng.randint(0, 9), rng.randint(0, 9), rng.randint(0, 9)]
+        assert q.insert(*row)
+        history[k] = [row]
+    for _ in range(150):
+        k = rng.randrange(30)
+        cols = [None] * 4
+        for c in rng.sample(range(1, 4), rng.randint(1, 3)):
+            cols[c] = rng.randint(10, 99)
+        assert q.update(k, *cols)
+        history[k].append([v if v is not None else old for v, old in zip(cols, history[k][-1])])
+
+    # a tail only keeps the columns it changed
+    assert len(t._tail_values) < len(t._tail) * 3
+
+    saved = table_module.np
+    try:
+        for np_module in (saved, None):
+            table_module.np = np_module
+            for k, versions in history.items():
+                assert q.select(k, 0, [1, 1, 1, 1])[0].columns == versions[-1]
+                assert q.select_version(k, 0, [1, 1, 1, 1], -1)[0].columns == versions[0]
+                for back in range(2, 5):
+                    expected = versions[max(len(versions) - back, 0)]
+                    assert q.select_version(k, 0, [1, 1, 1, 1], -back)[0].columns == expected
+            for c in range(1, 4):
+                assert q.sum(0, 29, c) == sum(v[-1][c] for v in history.values())
+                assert q.sum_version(0, 29, c, -2) == sum(v[max(len(v) - 2, 0)][c] for v in history.values())
+    finally:
+        table_module.np = saved
+
+    print("All delta tail tests passed!")
+
+def test_lazy_records():
+    print("Running lazy record tests...")
+    db = Database()
+    t = db.create_table("Lazy", 3, 0)
+    q = Query(t)
+    assert q.insert(1, 10, 20)
+    assert q.update(1, None, 11, None)
+
+    r = q.select(1, 0, [1, 1, 1])[0]
+    assert not hasattr(r, "__dict__")
+    lazy = q.select(1, 0, [0, 1, 0], lazy=True)[0]
+    base = q.select_version(1, 0, [1, 0, 1], -1, lazy=True)[0]
+    assert q.update(1, None, 12, 22)           # views keep the version they were made at
+    assert lazy.columns == [None, 11, None]
+    assert base.columns == [1, None, 20]
+    assert q.select(1, 0, [1, 1, 1], lazy=True)[0].columns == [1, 12, 22]
+
+    # a merge invalidates views made before it, it may hand their tail rids to other records
+    assert q.insert(2, 30, 40) and q.update(2, None, 31, None)
+    views = [q.select(1, 0, [1, 1, 1], lazy=True)[0], q.select_version(1, 0, [1, 1, 1], -1, lazy=True)[0]]
+    t._merge()
+    assert q.update(2, None, 22, 222)
+    for view in views:
+        try:
+            view.columns
+            assert False, "read a view across a merge"
+        except LookupError:
+            pass
+    assert q.select(1, 0, [1, 1, 1], lazy=True)[0].columns == [1, 12, 22]
+
+    print("All lazy record tests passed!")
+
+def test_reclaim_deleted():
+    print("Running reclaim tests...")
+    from lstore.lock_manager import LockManager
+    db = Database()
+    t = db.create_table("Reclaim", 3, 0)
+    t.lock_manager = LockManager()
+    q = Query(t)
+    for k in range(10):
+        assert q.insert(k, k, k)
+        assert q.update(k, None, k + 100, None)
+
+    # outside a transaction the slot is freed at once and the key can come back
+    rid3 = t._pk[3]
+    assert q.delete(3)
+    assert 3 not in t._pk and t._free_base == [rid3]
+    assert q.insert(3, 7, 7)
+    assert t._pk[3] == rid3 and t._free_base == []
+    assert q.select(3, 0, [1, 1, 1])[0].columns == [3, 7, 7]
+    assert q.select_version(3, 0, [1, 1, 1], -1)[0].columns == [3, 7, 7]
+
+    # a lazy view never reads through a freed slot, even once another record reuses it
+    view = q.select(2, 0, [1, 1, 1], lazy=True)[0]
+    kept = q.select(4, 0, [1, 1, 1], lazy=True)[0]
+    assert q.delete(2) and q.insert(99, 7, 7) and t._pk[99] == view.rid
+    try:
+        view.columns
+        assert False, "read another record through a freed slot"
+    except LookupError:
+        pass
+    assert kept.columns == [4, 104, 4]
+    assert q.delete(99) and q.insert(2, 102, 2)
+
+    # inside a transaction it waits until the locks are released
+    assert q.delete(5, txn_id=1)
+    assert t.reclaim() == 0 and 5 in t._pk
+    t.lock_manager.release_all(1)
+    assert t.reclaim() == 1 and 5 not in t._pk
+
+    # merge drops the tails of reclaimed records
+    assert q.delete(6)
+    tails_before = len(t._tail)
+    t._merge()
+    assert len(t._tail) == 0 < tails_before
+    assert q.insert_many([[5, 0, 0], [6, 0, 0], [20, 0, 0]]) == [True, True, True]
+    assert t._next_base_rid == 12
+    assert q.sum(0, 20, 1) == sum(k + 100 for k in range(10) if k not in (3, 5, 6)) + 7
+
+    print("All reclaim tests passed!")
+
+def test_structured_rids():
+    print("Running structured rid tests...")
+    import json
+    import os
+    import tempfile
+    from lstore.storage import OFFSET_MASK, is_tail_rid
+
+    db = Database()
+    t = db.create_table("Rids", 3, 0)
+    q = Query(t)
+    assert q.insert(1, 1, 1) and q.update(1, None, 2, None)
+    head = t._base.get(1, 0)    # base indirection points into the tail segment
+    assert is_tail_rid(head) and head & OFFSET_MASK < t._tail.size and not is_tail_rid(t._pk[1])
+
+    # table files from before structured rids numbered tails from 1e9
+    path = tempfile.mkdtemp()
+    with open(os.path.join(path, "catalog.json"), "w") as f:
+        json.dump({"tables": [{"name": "Old", "num_columns": 3, "key": 0}]}, f)
+    with open(os.path.join(path, "Old.json"), "w") as f:
+        json.dump({"name": "Old", "num_columns": 3, "key": 0, "next_base_rid": 2, "next_tail_rid": 1000000002,
+                   "rows": [[1, [1000000001, 1, 0, 6, 5, 1, 1]],
+                            [1000000000, [0, 1000000000, 0, 2, 0, 2, 0]],
+                            [1000000001, [1000000000, 1000000001, 0, 4, 0, 2, 3]]],
+                   "pk": [[5, 1]], "deleted": []}, f)
+    db2 = Database()
+    db2.open(path)
+    q2 = Query(db2.get_table("Old"))
+    assert q2.select(5, 0, [1, 1, 1])[0].columns == [5, 2, 3]
+    assert q2.select_version(5, 0, [1, 1, 1], -2)[0].columns == [5, 2, 1]
+    assert q2.select_version(5, 0, [1, 1, 1], -1)[0].columns == [5, 1, 1]
+
+    print("All structured rid tests passed!")
+
+def test_time_travel():
+    print("Running time travel tests...")
+    from lstore.clock import now
+    db = Database()
+    t = db.create_table("History", 3, 0)
+    q = Query(t)
+    before_insert = now()
+    for k in range(1, 6):
+        assert q.insert(k, k * 10, 0)
+    t0 = now()
+    assert q.update(1, None, 11, None)
+    t1 = now()
+    assert q.update(1, None, None, 7)
+    assert q.update(2, None, 21, None)
+    t2 = now()
+    assert q.update(1, None, 12, None)
+    assert before_insert < t0 < t1 < t2 < now()
+
+    assert q.select_as_of(1, 0, [1, 1, 1], before_insert) == []
+    assert q.select_as_of(1, 0, [1, 1, 1], t0)[0].columns == [1, 10, 0]
+    assert q.select_as_of(1, 0, [1, 1, 1], t1)[0].columns == [1, 11, 0]
+    assert q.select_as_of(1, 0, [1, 1, 1], t2)[0].columns == [1, 11, 7]
+    assert q.select_as_of(1, 0, [1, 1, 1], now())[0].columns == [1, 12, 7]
+    # the per-record timestamp list keeps up with updates made after it was built
+    assert q.update(1, None, 13, None)
+    assert q.select_as_of(1, 0, [1, 1, 1], now())[0].columns == [1, 13, 7]
+    assert q.select_as_of(1, 0, [1, 1, 1], t2)[0].columns == [1, 11, 7]
+
+    assert q.sum_as_of(1, 5, 1, before_insert) == 0
+    assert q.sum_as_of(1, 5, 1, t0) == 150
+    assert q.sum_as_of(1, 5, 1, t2) == 11 + 21 + 30 + 40 + 50
+    assert q.sum_as_of(1, 5, 1, now()) == q.sum(1, 5, 1)
+
+    print("All time travel tests passed!")
+
+def test_version_retention():
+    print("Running version retention tests...")
+    import tempfile
+    from lstore.clock import now
+    path = tempfile.mkdtemp()
+    db = Database()
+    db.open(path)
+    t = db.create_table("Kept", 3, 0)
+    q = Query(t)
+    assert q.insert(1, 10, 100) and q.insert(2, 20, 200)
+    times = [now()]
+    for v in (11, 12, 13):
+        assert q.update(1, None, v, None)
+        times.append(now())
+    t._merge()
+    assert t._tail.size == 0
+    # merge moved the old versions into the history store instead of dropping them
+    assert q.select_version(1, 0, [1, 1, 1], 0)[0].columns == [1, 13, 100]
+    assert q.select_version(1, 0, [1, 1, 1], -1)[0].columns == [1, 10, 100]
+    assert q.select_version(1, 0, [1, 1, 1], -2)[0].columns == [1, 12, 100]
+    assert q.select_version(1, 0, [1, 1, 1], -4)[0].columns == [1, 10, 100]
+    assert q.sum_version(1, 2, 1, -1) == 30
+    assert q.sum_version(1, 2, 1, -2) == 32
+    assert [q.select_as_of(1, 0, [0, 1, 0], ts)[0].columns[1] for ts in times] == [10, 11, 12, 13]
+    assert q.sum_as_of(1, 2, 1, times[1]) == 31
+
+    # versions made after a merge stack on top of the kept history
+    assert q.update(1, None, 14, None)
+    assert q.select_version(1, 0, [1, 1, 1], -2)[0].columns == [1, 13, 100]
+    assert q.select_version(1, 0, [1, 1, 1], -3)[0].columns == [1, 12, 100]
+
+    # history survives close/open
+    db.close()
+    db = Database()
+    db.open(path)
+    t = db.get_table("Kept")
+    q = Query(t)
+    assert q.select_version(1, 0, [1, 1, 1], 0)[0].columns == [1, 14, 100]
+    assert q.select_version(1, 0, [1, 1, 1], -1)[0].columns == [1, 10, 100]
+    assert q.select_as_of(1, 0, [0, 1, 0], times[2])[0].columns[1] == 12
+
+    # horizons: version count, then age
+    assert t.set_retention(versions=2)
+    t._merge()
+    assert q.select_version(1, 0, [1, 1, 1], -1)[0].columns == [1, 12, 100]
+    assert q.select_as_of(1, 0, [0, 1, 0], times[1]) == []
+    assert t.set_retention(seconds=0)
+    t._merge()
+    assert q.select_version(1, 0, [1, 1, 1], -1)[0].columns == [1, 14, 100]
+    assert t._history.size == 0 and not t._history_dir
+    assert not t.set_retention(versions=-1)
+
+    # a horizon larger than the record's history keeps all of it
+    assert t.set_retention(versions=3)
+    assert q.insert(3, 0, 0)
+    assert q.update(3, None, 1, None) and q.update(3, None, 2, None)
+    t._merge()
+    assert q.select_version(3, 0, [1, 1, 1], -1)[0].columns == [3, 0, 0]
+    assert q.select_version(3, 0, [1, 1, 1], -2)[0].columns == [3, 1, 0]
+    assert t._history_dir[t._pk[3]][1] == 2
+
+    print("All version retention tests passed!")
+
+def test_scan():
+    print("Running scan tests...")
+    db = Database()
+    t = db.create_table("Walk", 3, 0)
+    q = Query(t)
+    keys = list(range(50, 0, -1))
+    for k in keys:
+        assert q.insert(k, k * 2, k % 3)
+    assert q.update(7, None, 700, None)
+    assert q.delete(9)
+
+    records = list(q.scan(5, 12, [1, 0, 1], batch_size=3))
+    assert [r.key for r in records] == [5, 6, 7, 8, 10, 11, 12]
+    assert records[2].columns == [7, None, 1]
+    assert [r.columns[0] for r in q.scan(1, 100, [1, 0, 0])] == [k for k in range(1, 51) if k != 9]
+
+    batches = list(q.scan(1, 20, [0, 1, 0], batch_size=8, columnar=True))
+    assert [len(b[0]) for b in batches] == [8, 8, 3]
+    got = dict(zip([k for b in batches for k in b[0]], [int(v) for b in batches for v in b[1][1]]))
+    assert got[7] == 700 and got[8] == 16 and 9 not in got
+    assert batches[0][1][0] is None and batches[0][1][2] is None
+
+    # records deleted after the scan started are skipped, updates are seen
+    it = q.scan(1, 50, [0, 1, 0], batch_size=10)
+    first = next(it)
+    assert q.delete(30) and q.update(40, None, 1, None)
+    rest = list(it)
+    assert first.key == 1 and 30 not in [r.key for r in rest]
+    assert [r.columns[1] for r in rest if r.key == 40] == [1]
+    assert list(q.scan(60, 70, [1, 1, 1])) == []
+    assert q.scan(1, 2, [1, 1, 1], batch_size=0) is False
+
+    # with an ordered key index the keys are streamed from it, a batch at a time
+    assert t.index.create_index(0)
+    expected = [k for k in range(1, 51) if k not in (9, 30)]
+    assert [r.key for r in q.scan(1, 50, [1, 0, 0], batch_size=4)] == expected
+    assert [keys for keys, _ in q.scan(5, 12, [0, 1, 0], batch_size=3, columnar=True)] == \
+        [[5, 6, 7], [8, 10, 11], [12]]
+    it = q.scan(1, 60, [1, 0, 0], batch_size=5)
+    seen = [next(it).key for _ in range(5)]
+    assert q.insert(55, 0, 0) and q.delete(20)
+    seen += [r.key for r in it]
+    assert seen == [k for k in expected if k != 20] + [55]
+
+    print("All scan tests passed!")
+
+def test_select_where():
+    print("Running filtered select tests...")
+    db = Database()
+    t = db.create_table("Filter", 3, 0)
+    q = Query(t)
+    for k in range(1, 31):
+        assert q.insert(k, k % 5, k * 10)
+    assert q.update(12, None, 4, None)
+    assert q.delete(14)
+
+    got = q.select_where([(1, "==", 4)], [1, 0, 1])
+    assert [r.key for r in got] == [4, 9, 12, 19, 24, 29]
+    assert got[2].columns == [12, None, 120]
+    assert [r.key for r in q.select_where([(1, "==", 4), (2, ">", 100), (2, "<=", 240)], [1, 1, 1])] == [12, 19, 24]
+    # key predicates narrow the candidates through the primary key
+    assert [r.key for r in q.select_where([(0, ">=", 20), (0, "<", 25), (1, ">=", 3)], [1, 1, 1])] == [23, 24]
+    assert [r.columns for r in q.select_where([(0, "==", 12)], [1, 1, 1])] == [[12, 4, 120]]
+    assert q.select_where([(0, "==", 14)], [1, 1, 1]) == []
+    assert q.select_where([(1, ">", 3), (1, "<", 4)], [1, 1, 1]) == []
+    assert q.select_where([(1, "!=", 3)], [1, 1, 1]) is False
+    assert q.select_where([(7, "==", 3)], [1, 1, 1]) is False
+    # select on a non-key column goes through the same path
+    assert [r.key for r in q.select(0, 1, [1, 1, 1])] == [5, 10, 15, 20, 25, 30]
+    lazy = q.select(300, 2, [1, 1, 1], lazy=True)
+    assert [(r.key, r.columns) for r in lazy] == [(30, [30, 0, 300])]
+    assert [r.columns for r in q.select((4, 120), (1, 2), [0, 0, 1], lazy=True)] == [[None, None, 120]]
+
+    print("All filtered select tests passed!")
+
+def test_secondary_index():
+    print("Running secondary index tests...")
+    db = Database()
+    t = db.create_table("Orders", 3, 0)
+    q = Query(t)
+    for k in range(1, 21):
+        assert q.insert(k, k % 4, k * 3)
+    assert t.index.create_index(1)
+    assert t.index.is_indexed(0) and t.index.is_indexed(1) and not t.index.is_indexed(2)
+    assert sorted(t.index.locate(1, 2)) == [t._pk[k] for k in (2, 6, 10, 14, 18)]
+
+    # inserts after the index exists are indexed too
+    assert q.insert(22, 2, 0)
+    assert q.insert_many([[23, 2, 0], [24, 3, 0]]) == [True, True]
+    assert [r.key for r in q.select(2, 1, [1, 1, 1])] == [2, 6, 10, 14, 18, 22, 23]
+    assert [r.key for r in q.select_where([(1, ">=", 3), (1, "<=", 3), (2, "<", 30)], [1, 0, 0])] == [3, 7, 24]
+    assert sorted(t.index.locate_range(0, 1, 1)) == sorted(t._pk[k] for k in (1, 4, 5, 8, 9, 12, 13, 16, 17, 20))
+    assert t.index.locate(0, 7) == [t._pk[7]]
+
+    t.index.drop_index(1)
+    assert not t.index.is_indexed(1)
+    assert [r.key for r in q.select(2, 1, [1, 1, 1])] == [2, 6, 10, 14, 18, 22, 23]
+    assert not t.index.create_index(5)
+
+    print("All secondary index tests passed!")
+
+def test_index_maintenance():
+    print("Running index maintenance tests...")
+    db = Database()
+    t = db.create_table("Accounts", 4, 0)
+    q = Query(t)
+    for k in range(1, 31):
+        assert q.insert(k, k % 3, k % 5, k)
+    assert t.index.create_index(1) and t.index.create_index(2)
+    assert t.index.verify() == []
+
+    assert q.update(3, None, 1, None, None)        # 0 -> 1 on an indexed column
+    assert q.update(4, None, None, None, 99)       # column without an index
+    assert q.update_many([(5, [None, 0, 0, None]), (6, [None, 2, None, None])]) == [True, True]
+    assert q.increment(7, 2)
+    assert q.delete(9)
+    assert t.index.verify() == []
+    assert [r.key for r in q.select(0, 1, [1, 0, 0, 0])] == [5, 12, 15, 18, 21, 24, 27, 30]
+    assert 3 in [r.key for r in q.select(1, 1, [1, 0, 0, 0])]
+    assert [r.key for r in q.select(3, 2, [1, 0, 0, 0])] == [3, 7, 8, 13, 18, 23, 28]
+
+    # a freed slot reused by a new record is indexed under the new values only
+    assert q.insert(40, 2, 4, 0)
+    assert [r.key for r in q.select(4, 2, [1, 0, 0, 0])] == [4, 14, 19, 24, 29, 40]
+    assert t.index.verify() == []
+
+    # the checker reports entries that drifted from the table
+    rid = t._pk[10]
+    t.index.remove(1, 1, rid)
+    t.index.add(2, 77, rid)
+    assert sorted(t.index.verify()) == [("missing", 1, 1, rid), ("stale", 2, 77, rid)]
+
+    print("All index maintenance tests passed!")
+
+def test_bplus_tree():
+    print("Running B+ tree tests...")
+    import random
+    from lstore.bplustree import BPlusTree, _Inner
+    tree = BPlusTree(order=4)
+    for v, rid in [(5, 1), (3, 2), (8, 3), (5, 4), (1, 5), (9, 6)]:
+        tree.insert(v, rid)
+    assert tree.get(5) == [1, 4] and tree.get(4) == []
+    assert [k for k, _ in tree.range(2, 8)] == [3, 5, 8]
+    assert tree.min() == 1 and tree.max() == 9 and len(tree) == 6
+
+    # sequential keys keep leaves full and the tree shallow
+    tree = BPlusTree(order=8)
+    for k in range(1000):
+        tree.insert(k, k + 1)
+    depth, node = 0, tree.root
+    while type(node) is _Inner:
+        depth, node = depth + 1, node.children[0]
+    assert depth <= 4
+    assert [k for k, _ in tree.range(500, 505)] == list(range(500, 506))
+    assert tree.get(999) == [1000]
+
+    # random inserts and deletes against a dict model
+    rng = random.Random(7)
+    tree = BPlusTree(order=5)
+    model = {}
+    for rid in range(1, 3000):
+        v = rng.randrange(200)
+        tree.insert(v, rid)
+        model.setdefault(v, []).append(rid)
+        if rid % 3 == 0:
+            v = rng.choice(list(model))
+            gone = model[v].pop()
+            tree.delete(v, gone)
+            if not model[v]:
+                del model[v]
+    assert [(k, sorted(r)) for k, r in tree.items()] == [(k, sorted(model[k])) for k in sorted(model)]
+    assert [k for k, _ in tree.range(50, 60)] == [k for k in sorted(model) if 50 <= k <= 60]
+    assert tree.min() == min(model) and tree.max() == max(model)
+    try:
+        tree.delete(1000, 1)
+        assert False
+    except KeyError:
+        pass
+
+    print("All B+ tree tests passed!")
+
+def test_index_kinds():
+    print("Running index kind tests...")
+    import tempfile
+    path = tempfile.mkdtemp()
+    db = Database()
+    db.open(path)
+    t = db.create_table("Kinds", 3, 0)
+    q = Query(t)
+    for k in range(40, 0, -1):
+        assert q.insert(k, k % 4, k % 7)
+    assert t.index.kind(0) == "hash" and t.index.kind(1) is None
+    assert t.index.create_index(1, kind="hash") and t.index.create_index(2, kind="ordered")
+    assert not t.index.create_index(2, kind="btree")
+    assert t.index.kind(1) == "hash" and t.index.kind(2) == "ordered"
+
+    assert sorted(t.index.locate(1, 3)) == sorted(t._pk[k] for k in range(3, 41, 4))
+    assert [r.key for r in q.select_where([(1, "==", 3), (2, ">=", 5)], [1, 0, 0])] == [19, 27]
+    # a hash index still answers ranges, by visiting its distinct values
+    assert len(t.index.locate_range(2, 3, 1)) == 20
+    assert [r.key for r in q.select_where([(2, ">", 5)], [1, 0, 0])] == [6, 13, 20, 27, 34]
+
+    # an ordered index on the key column serves key ranges (sum, scan, select_where)
+    assert t.index.create_index(0, kind="ordered") and t.index.kind(0) == "ordered"
+    assert q.delete(12) and q.update(13, None, 9, None) and q.insert(41, 1, 1)
+    assert q.sum(10, 15, 1) == 10 % 4 + 11 % 4 + 9 + 14 % 4 + 15 % 4
+    assert [r.key for r in q.scan(38, 50, [1, 0, 0])] == [38, 39, 40, 41]
+    assert [r.key for r in q.select_where([(0, "<", 4)], [1, 0, 0])] == [1, 2, 3]
+    assert t.index.verify() == []
+
+    # index kinds survive close/open; switching a kind rebuilds
+    db.close()
+    db = Database()
+    db.open(path)
+    t = db.get_table("Kinds")
+    assert [t.index.kind(c) for c in range(3)] == ["ordered", "hash", "ordered"]
+    assert t.index.verify() == []
+    assert t.index.create_index(1, kind="ordered") and t.index.kind(1) == "ordered"
+    assert t.index.create_index(0, kind="hash") and t.index.indices[0] is None
+    assert t.index.verify() == []
+
+    print("All index kind tests passed!")
+
+def test_bulk_index_build():
+    print("Running bulk index build tests...")
+    import random
+    from lstore.bplustree import BPlusTree
+    rng = random.Random(11)
+    pairs = sorted((rng.randrange(300), rid) for rid in range(1, 2000))
+    for n in (0, 1, 5, 6, 7, 30, len(pairs)):
+        built = BPlusTree(order=5)
+        built.build(pairs[:n])
+        assert len(built) == n
+        assert [(k, list(r)) for k, r in built.items()] == \
+            [(k, [rid for v, rid in pairs[:n] if v == k]) for k in sorted(set(v for v, _ in pairs[:n]))]
+        # a bulk built tree keeps working incrementally
+        built.insert(150, 5000)
+        built.insert(-1, 5001)
+        assert 5000 in built.get(150) and built.min() == -1
+        assert [k for k, _ in built.range(100, 110)] == sorted(set(v for v, _ in pairs[:n] if 100 <= v <= 110))
+
+    db = Database()
+    t = db.create_table("Bulk", 3, 0)
+    q = Query(t)
+    for k in range(1, 501):
+        assert q.insert(k, (k * 37) % 50, k)
+    for k in range(1, 501, 3):
+        assert q.update(k, None, k % 11, None)
+    assert q.delete(100)
+    assert t.index.create_index(1) and t.index.create_index(2, kind="hash")
+    assert t.index.verify() == []
+    assert [r.key for r in q.select(7, 1, [1, 0, 0])] == \
+        sorted(k for k in range(1, 501) if k != 100 and (k % 11 if k % 3 == 1 else (k * 37) % 50) == 7)
+
+    print("All bulk index build tests passed!")
+
+def test_saved_indexes():
+    print("Running saved index tests...")
+    import tempfile
+    from lstore.index import SavedIndex
+    path = tempfile.mkdtemp()
+    db = Database()
+    db.open(path)
+    t = db.create_table("Saved", 3, 0)
+    q = Query(t)
+    for k in range(1, 1201):
+        assert q.insert(k, k % 9, k * 2)
+    assert t.index.create_index(1) and t.index.create_index(2, kind="hash") and t.index.create_index(0)
+    db.close()
+
+    db = Database()
+    db.open(path)
+    t = db.get_table("Saved")
+    q = Query(t)
+    # nothing is read back at open
+    assert all(isinstance(t.index.indices[c], SavedIndex) and not t.index.indices[c].loaded() for c in range(3))
+    assert [t.index.kind(c) for c in range(3)] == ["ordered", "ordered", "hash"]
+    assert [r.key for r in q.select(1000, 2, [1, 0, 0])] == [500]
+    assert t.index.indices[2].loaded() and not t.index.indices[1].loaded()
+    # writes load the index first, then keep it in step
+    assert q.update(9, None, 4, None) and q.insert(1201, 4, 0)
+    assert len(q.select(4, 1, [1, 0, 0])) == 135
+    assert t.index.verify() == []
+    db.close()
+
+    # unused indexes keep their pages, used ones are rewritten
+    db = Database()
+    db.open(path)
+    t = db.get_table("Saved")
+    assert Query(t).sum(1, 1201, 1) == sum(k % 9 for k in range(1, 1201)) + 4 + 4   # key 9: 0 -> 4, key 1201: 4
+    assert t.index.verify() == []
+
+    print("All saved index tests passed!")
+
+def test_composite_index():
+    print("Running composite index tests...")
+    import tempfile
+    path = tempfile.mkdtemp()
+    db = Database()
+    db.open(path)
+    t = db.create_table("Orders2", 4, 0)
+    q = Query(t)
+    for k in range(1, 301):
+        assert q.insert(k, k % 5, k % 7, k)
+    assert t.index.create_index([1, 2]) and t.index.kind((1, 2)) == "ordered"
+    assert not t.index.create_index([1, 1]) and not t.index.create_index([1, 2], kind="hash")
+
+    def expect(pred):
+        return [k for k in range(1, 301) if pred(k)]
+
+    assert sorted(t.index.locate_prefix([1, 2], [3, 4])) == sorted(t._pk[k] for k in expect(lambda k: k % 5 == 3 and k % 7 == 4))
+    assert sorted(t.index.locate_prefix([1, 2], [3], 2, 4)) == sorted(t._pk[k] for k in expect(lambda k: k % 5 == 3 and 2 <= k % 7 <= 4))
+    assert len(t.index.locate_prefix([1, 2], [3])) == 60
+    assert [r.key for r in q.select((2, 6), (1, 2), [1, 0, 0, 0])] == expect(lambda k: k % 5 == 2 and k % 7 == 6)
+    assert [r.key for r in q.select_where([(1, "==", 0), (2, ">", 4), (3, "<", 100)], [1, 0, 0, 0])] == \
+        expect(lambda k: k % 5 == 0 and k % 7 > 4 and k < 100)
+
+    # kept in step with writes, and saved with the table
+    assert q.update(3, None, 2, 6, None) and q.delete(37) and q.insert(301, 2, 6, 0)
+    assert [r.key for r in q.select((2, 6), (1, 2), [1, 0, 0, 0])] == \
+        [3] + expect(lambda k: k % 5 == 2 and k % 7 == 6 and k != 37) + [301]
+    assert t.index.verify() == []
+    db.close()
+    db = Database()
+    db.open(path)
+    t = db.get_table("Orders2")
+    assert t.index.kind((1, 2)) == "ordered"
+    assert [r.key for r in Query(t).select((2, 6), (1, 2), [1, 0, 0, 0])] == \
+        [3] + expect(lambda k: k % 5 == 2 and k % 7 == 6 and k != 37) + [301]
+    assert t.index.verify() == []
+    t.index.drop_index([1, 2])
+    assert t.index.kind((1, 2)) is None
+
+    print("All composite index tests passed!")
+
+def test_covering_index():
+    print("Running covering index tests...")
+    import tempfile
+    path = tempfile.mkdtemp()
+    db = Database()
+    db.open(path)
+    t = db.create_table("Dash", 4, 0)
+    q = Query(t)
+    for k in range(1, 201):
+        assert q.insert(k, k % 4, k * 10, k * 100)
+    assert not t.index.create_index(0, include=[1, 9])
+    assert t.index.create_index(0, include=[0, 1, 2])
+    assert t.index.covering([2]) is t.index.indices[0] and t.index.covering([3]) is None
+
+    def index_only(check):
+        # every read below must be served by the index, not by the records
+        def fail(*args, **kwargs):
+            raise AssertionError("record read")
+        t._column_values = t._values_at = t._value_at = fail
+        try:
+            check()
+        finally:
+            del t._column_values, t._values_at, t._value_at
+
+    def dashboard(rows):
+        assert q.sum(10, 50, 2) == sum(r[2] for r in rows if 10 <= r[0] <= 50)
+        assert q.max(1, 200, 2) == max(r[2] for r in rows)
+        assert q.avg(1, 200, 1) == sum(r[1] for r in rows) / len(rows)
+        got = [(r.key, r.columns) for r in q.select_where([(1, "==", 2), (0, "<", 60)], [1, 0, 1, 0])]
+        assert got == [(r[0], [r[0], None, r[2], None]) for r in rows if r[1] == 2 and r[0] < 60]
+
+    rows = [[k, k % 4, k * 10, k * 100] for k in range(1, 201)]
+    index_only(lambda: dashboard(rows))
+
+    # updates to included columns and deletes are reflected in the index
+    assert q.update(10, None, 2, 7, 1) and q.update(14, None, 3, None, None) and q.delete(18)
+    rows[9][1:] = [2, 7, 1]
+    rows[13][1] = 3
+    rows = [r for r in rows if r[0] != 18]
+    assert t.index.verify() == []
+    index_only(lambda: dashboard(rows))
+    assert q.sum(10, 50, 3) == sum(r[3] for r in rows if 10 <= r[0] <= 50)
+
+    db.close()
+    db = Database()
+    db.open(path)
+    t = db.get_table("Dash")
+    q = Query(t)
+    assert t.index.indices[0].include == (0, 1, 2) and not t.index.indices[0].loaded()
+    index_only(lambda: dashboard(rows))
+    assert t.index.verify() == []
+
+    print("All covering index tests passed!")
+
+def test_key_filter():
+    print("Running key filter tests...")
+    import tempfile
+    from lstore.bloom import BloomFilter
+    bf = BloomFilter(1000, 0.01)
+    for k in range(0, 2000, 2):
+        bf.add(k)
+    assert all(k in bf for k in range(0, 2000, 2))
+    assert sum(k in bf for k in range(1, 20001, 2)) < 300   # ~1% false positives
+    assert not bf.needs_rebuild()
+    bf.add(-1)
+    assert -1 in bf and bf.needs_rebuild()
+    assert 4.0 in bf and "x" not in bf     # keys of any hashable type, equal keys probe alike
+
+    path = tempfile.mkdtemp()
+    db = Database()
+    db.open(path)
+    t = db.create_table("Keys", 3, 0)
+    q = Query(t)
+    for k in range(100):
+        assert q.insert(k, k, k)
+    assert not t.create_key_filter(0) and t.create_key_filter()
+    kf = t._key_filter
+
+    def lookups():
+        # misses the filter rules out never reach the pk map
+        pk = t._pk
+        misses = 0
+
+        class Counting(dict):
+            def get(self, k, default=None):
+                nonlocal misses
+                misses += k not in self
+                return dict.get(self, k, default)
+
+            def __contains__(self, k):
+                nonlocal misses
+                misses += not dict.__contains__(self, k)
+                return dict.__contains__(self, k)
+
+        t._pk = Counting(pk)
+        try:
+            assert q.select(5, 0, [1, 1, 1])[0].columns == [5, 5, 5]
+            assert all(q.select(k, 0, [1, 1, 1]) == [] for k in range(1000, 2000))
+            assert q.select_many([1, 5000, 2], 0, [0, 1, 0]) == [(1,), None, (2,)]
+            assert not q.insert(5, 0, 0)
+            assert q.select(5.0, 0, [1, 0, 0])[0].columns == [5, None, None]
+        finally:
+            t._pk = pk
+        return misses
+
+    assert lookups() < 50
+    # inserts land in the filter, reclaimed keys can be inserted again
+    for k in range(100, 3000):
+        assert q.insert(k, k, k)
+    assert t._key_filter is not kf and t._key_filter.capacity >= 3000   # grew when full
+    assert all(k in t._key_filter for k in range(3000))
+    assert q.delete(7) and q.select(7, 0, [1, 1, 1]) == [] and q.insert(7, 70, 70)
+    assert [r.columns for r in q.select(7, 0, [1, 1, 1])] == [[7, 70, 70]]
+    assert q.insert_many([[3000, 1, 1], [8, 1, 1], [3000, 2, 2]]) == [True, False, False]
+    for k in range(100, 2800):
+        assert q.delete(k)
+    assert t._key_filter.stale * 2 <= t._key_filter.count   # rebuilt once half of it was stale
+
+    db.close()
+    db = Database()
+    db.open(path)
+    t = db.get_table("Keys")
+    q = Query(t)
+    assert t._key_filter is not None and all(k in t._key_filter for k in t._pk)
+    assert lookups() < 50
+
+    print("All key filter tests passed!")
+
 
 if __name__ == "__main__":
     run_tests()
     test_edges()
+    test_sum_paths()
+    test_aggregate_index()
+    test_range_aggregates()
+    test_insert_many()
+    test_select_many()
+    test_update_many()
+    test_increment()
+    test_column_storage()
+    test_delta_tails()
+    test_lazy_records()
+    test_reclaim_deleted()
+    test_structured_rids()
+    test_time_travel()
+    test_version_retention()
+    test_scan()
+    test_select_where()
+    test_secondary_index()
+    test_index_maintenance()
+    test_bplus_tree()
+    test_index_kinds()
+    test_bulk_index_build()
+    test_saved_indexes()
+    test_composite_index()
+    test_covering_index()
+    test_key_filter()
     print("All tests passed")
 
 